@@ -1,9 +1,16 @@
 import re
+import inspect
+import time
 import asyncio
 import base64
+import hmac
+import hashlib
 from pyrogram import Client, enums
+from pyrogram.errors import FloodWait
 from cache import user_file_count
-from config import API_ID, API_HASH, BOT_TOKEN
+from config import API_ID, API_HASH, BOT_TOKEN, API_MAX_RETRIES, STREAM_SECRET, STREAM_LINK_TTL
+from rate_limiter import api_limiter, outgoing_chat_id
+from metrics import timed_handler, TELEGRAM_SECONDS, TELEGRAM_CALLS, TELEGRAM_FLOOD_WAIT_SECONDS
 
 class Bot(Client):
     def __init__(self, *args, **kwargs):
@@ -14,6 +21,41 @@ class Bot(Client):
         self.MAX_FILES_PER_SESSION = 10
         self.PAGE_SIZE = 10
 
+    def add_handler(self, handler, group=0):
+        """Every registered update handler is timed for /metrics."""
+        if inspect.iscoroutinefunction(handler.callback):
+            handler.callback = timed_handler(handler.callback)
+        return super().add_handler(handler, group)
+
+    async def invoke(self, query, *args, flood_retries=API_MAX_RETRIES, **kwargs):
+        """
+        Every raw API call goes through here: outgoing messages wait for the
+        shared rate limiter, and FloodWaits are waited out and retried instead
+        of being dropped. Callers that pace themselves pass flood_retries=0 to
+        get the FloodWait raised (after it is recorded).
+        """
+        method = query.QUALNAME
+        chat_id = outgoing_chat_id(query)
+        attempt = 0
+        start = time.perf_counter()
+        try:
+            while True:
+                if chat_id is not None:
+                    await api_limiter.acquire(chat_id)
+                api_limiter.record_call(method)
+                TELEGRAM_CALLS.labels(method).inc()
+                try:
+                    return await super().invoke(query, *args, **kwargs)
+                except FloodWait as e:
+                    api_limiter.record_flood_wait(method, e.value, chat_id)
+                    TELEGRAM_FLOOD_WAIT_SECONDS.labels(method).inc(e.value)
+                    attempt += 1
+                    if attempt > flood_retries:
+                        raise
+                    await asyncio.sleep(e.value)
+        finally:
+            TELEGRAM_SECONDS.labels(method).observe(time.perf_counter() - start)
+
     def sanitize_query(self, query):
         """Sanitizes and normalizes a search query for consistent matching of 'and' and '&'."""
         query = query.strip().lower()
@@ -26,8 +68,41 @@ class Bot(Client):
         return ''.join(c for c in text if not (0xD800 <= ord(c) <= 0xDFFF))
 
     def encode_file_link(self, channel_id, message_id):
-        raw = f"{channel_id}_{message_id}".encode()
-        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+        return urlsafe_encode(f"{channel_id}_{message_id}".encode())
+
+    def decode_file_link(self, file_link):
+        """Inverse of encode_file_link: return (channel_id, message_id). Raises ValueError on a bad link."""
+        channel_id, message_id = map(int, urlsafe_decode(file_link).decode().split("_"))
+        return channel_id, message_id
+
+    def sign_stream_link(self, channel_id, message_id, user_id, ttl=STREAM_LINK_TTL):
+        """
+        Signed /stream token for one user and file, valid for `ttl` seconds.
+        Only issue it to a user who has passed is_user_authorized.
+        """
+        payload = f"{channel_id}_{message_id}_{user_id}_{int(time.time()) + ttl}".encode()
+        return f"{urlsafe_encode(payload)}.{urlsafe_encode(stream_signature(payload))}"
+
+    def verify_stream_link(self, token):
+        """Return (channel_id, message_id, user_id). Raises ValueError if the token is forged or expired."""
+        payload, _, signature = token.partition(".")
+        payload = urlsafe_decode(payload)
+        if not hmac.compare_digest(stream_signature(payload), urlsafe_decode(signature)):
+            raise ValueError("bad signature")
+        channel_id, message_id, user_id, expires = map(int, payload.decode().split("_"))
+        if expires < time.time():
+            raise ValueError("link expired")
+        return channel_id, message_id, user_id
+
+
+def urlsafe_encode(data):
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+def urlsafe_decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+def stream_signature(payload):
+    return hmac.new(STREAM_SECRET.encode(), payload, hashlib.sha256).digest()[:16]
 
 
 bot = Bot(
@@ -35,5 +110,7 @@ bot = Bot(
     api_id=API_ID,
     api_hash=API_HASH,
     bot_token=BOT_TOKEN,
-    parse_mode=enums.ParseMode.HTML
+    parse_mode=enums.ParseMode.HTML,
+    # Raise every FloodWait so Bot.invoke paces the limiter and records it
+    sleep_threshold=0
 )
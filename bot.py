@@ -4,24 +4,34 @@ import uvicorn
 import logging
 
 from app import bot
-from db import files_col
-from utility import file_queue_worker, periodic_expiry_cleanup
+from db import files_col, ensure_indexes
+from utility import start_file_workers
 from fast_api import api
-from config import LOG_CHANNEL_ID
+from config import LOG_CHANNEL_ID, SEARCH_BACKEND
+from search_index import search_index
+from indexer import resume_index_jobs
+from http_client import http
+from offline_matcher import offline_matcher
+from loop_monitor import loop_monitor
 from handlers import owner, user, callbacks
 
 async def main():
     """
     Starts the bot and FastAPI server.
     """
-    if "file_name_text" not in [idx["name"] for idx in files_col.list_indexes()]:
-        files_col.create_index([("file_name", "text")])
+    loop_monitor.start()
+    await ensure_indexes()
+    await http.start()
+
+    if SEARCH_BACKEND == "local":
+        await search_index.load(files_col)
+    await offline_matcher.load_configured()
 
     await bot.start()
 
     bot.loop.create_task(start_fastapi())
-    bot.loop.create_task(file_queue_worker(bot))
-    bot.loop.create_task(periodic_expiry_cleanup())
+    start_file_workers(bot)
+    await resume_index_jobs(bot)
 
     try:
         me = await bot.get_me()
@@ -49,6 +59,7 @@ if __name__ == "__main__":
         bot.loop.run_forever()
     except KeyboardInterrupt:
         bot.stop()
+        bot.loop.run_until_complete(http.close())
         tasks = asyncio.all_tasks(loop=bot.loop)
         for task in tasks:
             task.cancel()
@@ -1,14 +1,52 @@
 
 from cachetools import TTLCache
+from config import SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL
+from metrics import registry, CacheCollector
+
+# Every StatsTTLCache, exported through /metrics
+STATS_CACHES = []
+
+class StatsTTLCache(TTLCache):
+    """TTLCache that counts lookup hits and misses (`in` checks are not counted)."""
+
+    def __init__(self, maxsize, ttl, name, **kwargs):
+        super().__init__(maxsize, ttl, **kwargs)
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        STATS_CACHES.append(self)
+
+    def __getitem__(self, key):
+        try:
+            value = super().__getitem__(key)
+        except KeyError:
+            self.misses += 1
+            raise
+        self.hits += 1
+        return value
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        self.misses += 1
+        return default
 
 # Cache for user file counts
-user_file_count = TTLCache(maxsize=1000, ttl=3600)
+user_file_count = StatsTTLCache(maxsize=1000, ttl=3600, name="user_file_count")
 
 # Cache for query IDs
-query_id_map = TTLCache(maxsize=1000, ttl=300)
+query_id_map = StatsTTLCache(maxsize=1000, ttl=300, name="query_id_map")
+
+# Cache for /search API responses: {(query, channel_id, page, page_size, version): body}
+search_api_cache = StatsTTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL, name="search_api_cache")
+
+# Cache for search result pages: {(query, channel_id, version, (page, page_size)): (files, has_more)}
+search_cache = StatsTTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL, name="search_cache")
+
+# Keyset cursors: {(query, channel_id, version, (page, page_size)): last sort key of the previous page}
+search_cursor_cache = StatsTTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL, name="search_cursor_cache")
 
-# Cache for search API results
-search_api_cache = TTLCache(maxsize=100, ttl=300)
+# Result counts: {(query, channel_id, version): (total_files, approximate)}
+search_count_cache = StatsTTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL, name="search_count_cache")
 
-# Cache for search results
-search_cache = TTLCache(maxsize=100, ttl=300)
+registry.register(CacheCollector(STATS_CACHES))
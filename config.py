@@ -1,20 +1,14 @@
 
 import os
+import hashlib
 import logging
 from dotenv import load_dotenv
 from os import environ
 from requests import get as rget
+from log_pipeline import setup_logging, TEXT_FORMAT
 
-# Logger setup
-LOG_FILE = "bot_log.txt"
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-    handlers=[
-        logging.FileHandler(LOG_FILE, encoding="utf-8"),
-        logging.StreamHandler()
-    ]
-)
+# Logger setup: console only until config.env is loaded, then the queued file pipeline below
+logging.basicConfig(level=logging.INFO, format=TEXT_FORMAT)
 
 logger = logging.getLogger("sharing_bot")
                 
@@ -39,6 +33,23 @@ except:
 
 load_dotenv('config.env', override=True)
 
+# Logging: records go through a queue to a listener thread that writes a rotating file
+LOG_FILE = os.getenv('LOG_FILE', 'bot_log.txt')
+LOG_MAX_BYTES = int(float(os.getenv('LOG_MAX_MB', 10)) * 1024 * 1024)
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+# Time-based rotation instead of size-based, e.g. 'midnight' or 'H'
+LOG_ROTATE_WHEN = os.getenv('LOG_ROTATE_WHEN', '')
+LOG_JSON = os.getenv('LOG_JSON', 'false').lower() in ('1', 'true', 'yes')
+# How much of the log a bare /log sends
+LOG_DEFAULT_MB = float(os.getenv('LOG_DEFAULT_MB', 5))
+setup_logging(
+    LOG_FILE,
+    max_bytes=LOG_MAX_BYTES,
+    backup_count=LOG_BACKUP_COUNT,
+    rotate_when=LOG_ROTATE_WHEN,
+    json_format=LOG_JSON,
+)
+
 #TELEGRAM API
 API_ID = int(os.getenv('API_ID'))
 API_HASH = os.getenv('API_HASH')
@@ -52,12 +63,77 @@ LOG_CHANNEL_ID = int(os.getenv('LOG_CHANNEL_ID'))
 BACKUP_CHANNEL = os.getenv('BACKUP_CHANNEL', '')
 
 MY_DOMAIN = os.getenv('MY_DOMAIN')
+# /stream links are HMAC-signed per user and expire; the key defaults to one derived from BOT_TOKEN
+STREAM_SECRET = os.getenv('STREAM_SECRET') or hashlib.sha256(f"stream:{BOT_TOKEN}".encode()).hexdigest()
+STREAM_LINK_TTL = int(os.getenv('STREAM_LINK_TTL', 6 * 3600))
 
 TOKEN_VALIDITY_SECONDS = 24 * 60 * 60  # 24 hours
 
+# Outgoing Telegram API limits (messages per second) and FloodWait retries
+API_GLOBAL_RATE = float(os.getenv('API_GLOBAL_RATE', 30))
+API_CHAT_RATE = float(os.getenv('API_CHAT_RATE', 1))
+API_GROUP_RATE = float(os.getenv('API_GROUP_RATE', 20 / 60))
+API_CHAT_BURST = int(os.getenv('API_CHAT_BURST', 3))
+API_MAX_RETRIES = int(os.getenv('API_MAX_RETRIES', 3))
+
+# Event-loop watchdog: heartbeat period and the stall that counts as a blocking call (seconds)
+LOOP_MONITOR_INTERVAL = float(os.getenv('LOOP_MONITOR_INTERVAL', 0.1))
+LOOP_BLOCK_THRESHOLD = float(os.getenv('LOOP_BLOCK_THRESHOLD', 0.25))
+
 MONGO_URI = os.getenv("MONGO_URI")
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', 50))
+MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', 5))
+MONGO_TIMEOUT_MS = int(os.getenv('MONGO_TIMEOUT_MS', 10000))
+
+# File queue micro-batching: flush after this many files or seconds, whichever comes first
+FILE_BATCH_SIZE = int(os.getenv('FILE_BATCH_SIZE', 100))
+FILE_BATCH_WINDOW = float(os.getenv('FILE_BATCH_WINDOW', 0.5))
+
+# File writer shards and concurrent audio/TMDB post-processing workers
+FILE_WORKERS = int(os.getenv('FILE_WORKERS', 4))
+ENRICH_WORKERS = int(os.getenv('ENRICH_WORKERS', 4))
+
+# Messages fetched per get_messages call in /index (Telegram allows at most 200)
+INDEX_BATCH_SIZE = min(int(os.getenv('INDEX_BATCH_SIZE', 200)), 200)
+# Attempts per /index batch before the job fails (with exponential backoff between them)
+INDEX_FETCH_RETRIES = int(os.getenv('INDEX_FETCH_RETRIES', 5))
+RESTORE_PREFETCH = int(os.getenv('RESTORE_PREFETCH', 8))
+RESTORE_CHECKPOINT_EVERY = int(os.getenv('RESTORE_CHECKPOINT_EVERY', 25))
+
+# SEARCH BACKEND: "atlas" uses Atlas $search, "local" uses the in-process inverted index
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'atlas').strip().lower()
+SEARCH_CACHE_SIZE = int(os.getenv('SEARCH_CACHE_SIZE', 2000))
+SEARCH_CACHE_TTL = int(os.getenv('SEARCH_CACHE_TTL', 300))
+# Counts past this many matches are shown as approximate ("1000+"); 0 counts exactly
+SEARCH_COUNT_THRESHOLD = int(os.getenv('SEARCH_COUNT_THRESHOLD', 1000))
+# Upper bound (seconds) before newly saved files show up in cached search results
+SEARCH_INVALIDATE_DELAY = float(os.getenv('SEARCH_INVALIDATE_DELAY', 2))
+SEARCH_API_MAX_AGE = int(os.getenv('SEARCH_API_MAX_AGE', 30))
+SEARCH_API_MAX_PAGE_SIZE = int(os.getenv('SEARCH_API_MAX_PAGE_SIZE', 50))
+# Deepest /search page; pages without a cached cursor fall back to $skip, so keep this small
+SEARCH_API_MAX_PAGE = int(os.getenv('SEARCH_API_MAX_PAGE', 20))
 
 TMDB_API_KEY = os.getenv('TMDB_API_KEY')
+IMDB_TIMEOUT = float(os.getenv('IMDB_TIMEOUT', 10))
+# Threads reserved for IMDb scrapes, so stuck scrapes cannot starve other to_thread work
+IMDB_WORKERS = int(os.getenv('IMDB_WORKERS', 2))
+# TMDB image size for first-time poster uploads: w780, w1280 or original
+TMDB_POSTER_SIZE = os.getenv('TMDB_POSTER_SIZE', 'original')
+TMDB_CACHE_SIZE = int(os.getenv('TMDB_CACHE_SIZE', 1000))
+TMDB_SEARCH_TTL = int(os.getenv('TMDB_SEARCH_TTL', 7 * 24 * 3600))
+TMDB_DETAILS_TTL = int(os.getenv('TMDB_DETAILS_TTL', 24 * 3600))
+IMDB_CACHE_TTL = int(os.getenv('IMDB_CACHE_TTL', 3 * 24 * 3600))
+TMDB_MISS_TTL = int(os.getenv('TMDB_MISS_TTL', 6 * 3600))
+TMDB_RESOLVE_CONCURRENCY = int(os.getenv('TMDB_RESOLVE_CONCURRENCY', 5))
+# Optional paths to TMDB daily ID exports (movie_ids_*.json.gz, tv_series_ids_*.json.gz)
+TMDB_MOVIE_EXPORT = os.getenv('TMDB_MOVIE_EXPORT', '')
+TMDB_TV_EXPORT = os.getenv('TMDB_TV_EXPORT', '')
+
+# Shared HTTP client (TMDB, URL shortener)
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', 15))
+HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', 2))
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 100))
+HTTP_POOL_PER_HOST = int(os.getenv('HTTP_POOL_PER_HOST', 20))
 
 #SHORTERNER API
 URLSHORTX_API_TOKEN = os.getenv('URLSHORTX_API_TOKEN')
@@ -1,16 +1,145 @@
-from pymongo import MongoClient
-from config import MONGO_URI
+import logging
+from datetime import datetime, timezone
+from pymongo import AsyncMongoClient, ASCENDING, TEXT, IndexModel
+from pymongo.errors import PyMongoError
+from metrics import MongoCommandMetrics
+from config import MONGO_URI, MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_TIMEOUT_MS
 
 
-# MongoDB setup
-mongo = MongoClient(MONGO_URI)
+# MongoDB setup (async client: every call must be awaited, nothing blocks the event loop)
+mongo = AsyncMongoClient(
+    MONGO_URI,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    timeoutMS=MONGO_TIMEOUT_MS,
+    serverSelectionTimeoutMS=MONGO_TIMEOUT_MS,
+    event_listeners=[MongoCommandMetrics()],
+)
 db = mongo["sharing_bot"]
+
+logger = logging.getLogger(__name__)
 files_col = db["files"]
 tmdb_col = db["tmdb"]
 tokens_col = db["tokens"]
 auth_users_col = db["auth_users"]
 allowed_channels_col = db["allowed_channels"]
 users_col = db["users"]
+jobs_col = db["jobs"]
+api_cache_col = db["api_cache"]
+
+# Indexes for every hot lookup. TTL indexes (expireAfterSeconds=0) let MongoDB
+# drop tokens and authorizations as soon as their `expiry` date has passed.
+INDEXES = {
+    files_col: [
+        IndexModel([("channel_id", ASCENDING), ("message_id", ASCENDING)], name="channel_message", unique=True),
+        IndexModel([("channel_id", ASCENDING), ("file_name", ASCENDING)], name="channel_file_name"),
+        IndexModel([("file_name", TEXT)], name="file_name_text"),
+    ],
+    users_col: [
+        IndexModel([("user_id", ASCENDING)], name="user_id", unique=True),
+    ],
+    tokens_col: [
+        IndexModel([("token_id", ASCENDING), ("user_id", ASCENDING)], name="token_user", unique=True),
+        IndexModel([("user_id", ASCENDING), ("expiry", ASCENDING)], name="user_expiry"),
+        IndexModel([("expiry", ASCENDING)], name="expiry_ttl", expireAfterSeconds=0),
+    ],
+    auth_users_col: [
+        IndexModel([("user_id", ASCENDING)], name="user_id", unique=True),
+        IndexModel([("expiry", ASCENDING)], name="expiry_ttl", expireAfterSeconds=0),
+    ],
+    tmdb_col: [
+        IndexModel([("tmdb_id", ASCENDING), ("tmdb_type", ASCENDING)], name="tmdb_id_type", unique=True),
+    ],
+    allowed_channels_col: [
+        IndexModel([("channel_id", ASCENDING)], name="channel_id", unique=True),
+    ],
+    jobs_col: [
+        IndexModel([("type", ASCENDING), ("status", ASCENDING)], name="type_status"),
+    ],
+    api_cache_col: [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+}
+
+def parse_legacy_expiry(value):
+    """A stored string/number expiry as an aware datetime, or None if it cannot be read."""
+    try:
+        if isinstance(value, str):
+            expiry = datetime.fromisoformat(value)
+            return expiry if expiry.tzinfo else expiry.replace(tzinfo=timezone.utc)
+        # Epoch seconds, or milliseconds for large values
+        return datetime.fromtimestamp(value / 1000 if value > 1e11 else value, timezone.utc)
+    except (ValueError, TypeError, OverflowError, OSError):
+        return None
+
+async def migrate_legacy_expiry(collection):
+    """
+    TTL indexes only expire BSON dates: convert string/number `expiry` values so
+    older documents expire too, and drop the ones that cannot be parsed.
+    """
+    converted = removed = 0
+    async for doc in collection.find({"expiry": {"$type": ["string", "number"]}}, {"expiry": 1}):
+        expiry = parse_legacy_expiry(doc["expiry"])
+        if expiry is None:
+            await collection.delete_one({"_id": doc["_id"]})
+            removed += 1
+        else:
+            await collection.update_one({"_id": doc["_id"]}, {"$set": {"expiry": expiry}})
+            converted += 1
+    if converted or removed:
+        logger.info(f"{collection.name}: converted {converted} legacy expiry values, removed {removed} unreadable ones.")
+
+async def ensure_indexes():
+    """
+    Idempotently create every index in INDEXES.
+    Each index is created on its own so one conflict (e.g. existing duplicates
+    blocking a unique index) is logged without skipping the rest.
+    """
+    for collection in (tokens_col, auth_users_col):
+        try:
+            await migrate_legacy_expiry(collection)
+        except PyMongoError as e:
+            logger.error(f"Could not migrate expiry values on {collection.name}: {e}")
+    for collection, models in INDEXES.items():
+        for model in models:
+            try:
+                await collection.create_indexes([model])
+            except PyMongoError as e:
+                logger.error(f"Could not create index {model.document['name']} on {collection.name}: {e}")
+
+async def index_usage_report():
+    """
+    Return {collection_name: [(index_name, ops, since), ...]} from $indexStats,
+    most used first.
+    """
+    report = {}
+    for collection in INDEXES:
+        cursor = await collection.aggregate([{"$indexStats": {}}])
+        stats = await cursor.to_list()
+        report[collection.name] = sorted(
+            ((s["name"], s["accesses"]["ops"], s["accesses"]["since"]) for s in stats),
+            key=lambda item: item[1],
+            reverse=True
+        )
+    return report
+
+
+async def iter_batches(collection, query=None, projection=None, batch_size=1000):
+    """
+    Yield every matching document in _id order.
+    Each batch is its own bounded query, so long scans never run into timeoutMS.
+    """
+    query = dict(query or {})
+    last_id = None
+    while True:
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await collection.find(query, projection).sort("_id", 1).limit(batch_size).to_list()
+        if not batch:
+            return
+        for doc in batch:
+            yield doc
+        last_id = batch[-1]["_id"]
 
 
 ''' JSON setup for Atlas Search'''
@@ -19,9 +148,20 @@ users_col = db["users"]
   "mappings": {
     "dynamic": false,
     "fields": {
-      "file_name": {
-        "analyzer": "custom_filename",
-        "type": "string"
+      "file_name": [
+        {
+          "analyzer": "custom_filename",
+          "type": "string"
+        },
+        {
+          "type": "token"
+        }
+      ],
+      "channel_id": {
+        "type": "number"
+      },
+      "message_id": {
+        "type": "number"
       }
     }
   },
@@ -1,10 +1,17 @@
-import base64
+import gzip
+import uuid
+import hashlib
 import asyncio
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from urllib.parse import quote
+from fastapi import FastAPI, Request, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app import bot
-from config import MY_DOMAIN
+from db import files_col, allowed_channels_col
+from cache import search_api_cache
+from utility import search_channel, search_version, is_user_authorized, generate_telegram_link
+from metrics import render_metrics
+from config import MY_DOMAIN, BOT_USERNAME, SEARCH_API_MAX_AGE, SEARCH_API_MAX_PAGE_SIZE, SEARCH_API_MAX_PAGE
 
 api = FastAPI()
 api.add_middleware(
@@ -13,9 +20,11 @@ api.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 CHUNK_SIZE = 1024 * 1024
+GZIP_MIN_SIZE = 1000
 CONCURRENCY_LIMIT = 3
 semaphore = asyncio.Semaphore(CONCURRENCY_LIMIT)
 
@@ -24,3 +33,190 @@ async def root():
     """Greet users on root route."""
     return JSONResponse({"message": "👋 Hello! Welcome"})
 
+@api.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint."""
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
+def parse_range(range_header, file_size):
+    """
+    Parse a single `bytes=` range into inclusive (start, end).
+    Returns None when the header is absent; raises ValueError when it cannot be satisfied.
+    """
+    if not range_header:
+        return None
+    unit, _, spec = range_header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        raise ValueError("unsupported range")
+    start, _, end = spec.strip().partition("-")
+    if start:
+        start = int(start)
+        end = min(int(end), file_size - 1) if end else file_size - 1
+    else:
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length <= 0:
+            raise ValueError("empty suffix range")
+        start, end = max(file_size - length, 0), file_size - 1
+    if start > end or start >= file_size:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+async def stream_file_range(message, start, end):
+    """
+    Yield bytes start..end (inclusive) of a message's media.
+    stream_media seeks in whole CHUNK_SIZE chunks, so the first and last chunks are trimmed.
+    """
+    first_chunk = start // CHUNK_SIZE
+    last_chunk = end // CHUNK_SIZE
+    head_skip = start - first_chunk * CHUNK_SIZE
+    remaining = end - start + 1
+    if remaining <= 0:
+        return
+    async with semaphore:
+        async for chunk in bot.stream_media(message, offset=first_chunk, limit=last_chunk - first_chunk + 1):
+            if head_skip:
+                chunk = chunk[head_skip:]
+                head_skip = 0
+            if len(chunk) > remaining:
+                chunk = chunk[:remaining]
+            remaining -= len(chunk)
+            yield chunk
+            if remaining <= 0:
+                break
+
+@api.get("/stream/{token}")
+async def stream_file(token: str, request: Request):
+    """
+    Stream an indexed file with HTTP Range support.
+    Only serves signed links from bot.sign_stream_link, for users who are still authorized.
+    """
+    try:
+        channel_id, message_id, user_id = bot.verify_stream_link(token)
+    except ValueError:
+        raise HTTPException(status_code=403, detail="Invalid or expired link")
+    if not await is_user_authorized(user_id):
+        raise HTTPException(status_code=403, detail="Invalid or expired link")
+
+    file_doc = await files_col.find_one({"channel_id": channel_id, "message_id": message_id})
+    if not file_doc:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    message = await bot.get_messages(channel_id, message_id)
+    media = message and (message.document or message.video or message.audio)
+    if not media:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    file_size = media.file_size
+    file_name = getattr(media, "file_name", None) or file_doc.get("file_name") or "file"
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"inline; filename*=UTF-8''{quote(file_name)}",
+    }
+    try:
+        byte_range = parse_range(request.headers.get("range"), file_size)
+    except ValueError:
+        return JSONResponse(
+            {"detail": "Requested range not satisfiable"},
+            status_code=416,
+            headers={"Content-Range": f"bytes */{file_size}"}
+        )
+
+    if byte_range:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+    else:
+        start, end = 0, file_size - 1
+        status_code = 200
+    headers["Content-Length"] = str(end - start + 1)
+
+    return StreamingResponse(
+        stream_file_range(message, start, end),
+        status_code=status_code,
+        media_type=getattr(media, "mime_type", None) or "application/octet-stream",
+        headers=headers,
+    )
+
+# Search generations restart at zero with the process, so ETags are salted per process
+ETAG_SALT = uuid.uuid4().hex[:8]
+
+def search_etag(query, channel_id, page, page_size, version):
+    digest = hashlib.sha1(f"{query}|{channel_id}|{page}|{page_size}".encode()).hexdigest()[:16]
+    return f'"{ETAG_SALT}-{version}-{digest}"'
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of an If-None-Match header (a list of tags, or *) against one ETag."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+@api.get("/search")
+async def search_api(
+    request: Request,
+    q: str,
+    channel_id: int,
+    page: int = Query(1, ge=1, le=SEARCH_API_MAX_PAGE),
+    page_size: int = Query(10, ge=1),
+):
+    """
+    Paginated JSON search over one channel.
+    Responses carry an ETag derived from the channel's search generation, so
+    clients and proxies revalidate cheaply until the channel's files change.
+    """
+    query = bot.sanitize_query(q)
+    if not query:
+        raise HTTPException(status_code=400, detail="Empty query")
+    page_size = min(page_size, SEARCH_API_MAX_PAGE_SIZE)
+    version = search_version(channel_id)
+    etag = search_etag(query, channel_id, page, page_size, version)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={SEARCH_API_MAX_AGE}",
+        "Vary": "Accept-Encoding",
+    }
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    cache_key = (query, channel_id, page, page_size, version)
+    body = search_api_cache.get(cache_key)
+    if body is None:
+        if not await allowed_channels_col.find_one({"channel_id": channel_id}, {"_id": 1}):
+            raise HTTPException(status_code=404, detail="Unknown channel")
+        files, total_files, total_is_approximate, has_more = await search_channel(query, channel_id, page, page_size)
+        results = []
+        for f in files:
+            results.append({
+                "file_name": f.get("file_name"),
+                "file_size": f.get("file_size"),
+                "file_format": f.get("file_format"),
+                "file_link": generate_telegram_link(BOT_USERNAME, f["channel_id"], f["message_id"]),
+            })
+        body = {
+            "query": query,
+            "channel_id": channel_id,
+            "page": page,
+            "page_size": page_size,
+            "total": total_files,
+            "total_is_approximate": total_is_approximate,
+            "has_more": has_more,
+            "results": results,
+        }
+        search_api_cache[cache_key] = body
+
+    return compressed_json(body, request, headers)
+
+def compressed_json(body, request, headers):
+    """
+    JSON response, gzipped when the client accepts it. Compression is done here
+    rather than by middleware so /stream responses keep their exact byte ranges.
+    """
+    response = JSONResponse(body, headers=headers)
+    if len(response.body) >= GZIP_MIN_SIZE and "gzip" in request.headers.get("accept-encoding", ""):
+        response.body = gzip.compress(response.body, compresslevel=5)
+        response.headers["Content-Encoding"] = "gzip"
+        response.headers["Content-Length"] = str(len(response.body))
+    return response
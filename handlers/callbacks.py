@@ -1,24 +1,21 @@
 
-import base64
 import logging
 from urllib.parse import unquote_plus
-from datetime import datetime, timezone
 
 from pyrogram import filters, enums
 from pyrogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from pyrogram.errors import MessageNotModified
 
-from config import LOG_CHANNEL_ID, BOT_USERNAME
-from db import files_col, allowed_channels_col, tokens_col
+from config import LOG_CHANNEL_ID
+from db import files_col, allowed_channels_col
 from utility import (
     get_user_link,
-    build_search_pipeline,
+    search_channel,
     human_readable_size,
     is_user_authorized,
-    delete_after_delay,
-    generate_token,
-    shorten_url,
-    get_token_link,
+    get_unlock_link,
+    send_file_to_user,
+    FILE_STATUS_TEXT,
     safe_api_call
 )
 from query_helper import get_query_by_id
@@ -36,20 +33,15 @@ async def channel_search_callback_handler(client, callback_query: CallbackQuery)
         user_link = await get_user_link(callback_query.from_user)
         user_id = callback_query.from_user.id
 
-        skip = (page - 1) * bot.SEARCH_PAGE_SIZE
         query = get_query_by_id(query_id)
         if not query:
             await callback_query.answer("Your query has expired. Please send a new one.", show_alert=True)
             return
 
         query = bot.sanitize_query(unquote_plus(query))
-        pipeline = build_search_pipeline(query, [channel_id], skip, bot.SEARCH_PAGE_SIZE)
+        files, total_files, total_is_approximate, has_more = await search_channel(query, channel_id, page, bot.SEARCH_PAGE_SIZE)
 
-        result = list(files_col.aggregate(pipeline))
-        files = result[0]["results"] if result and result[0]["results"] else []
-        total_files = result[0]["totalCount"][0]["total"] if result and result[0]["totalCount"] else 0
-
-        channel_info = allowed_channels_col.find_one({'channel_id': channel_id})
+        channel_info = await allowed_channels_col.find_one({'channel_id': channel_id})
         channel_name = channel_info.get('channel_name', str(channel_id)) if channel_info else str(channel_id)
 
         if not files:
@@ -82,8 +74,9 @@ async def channel_search_callback_handler(client, callback_query: CallbackQuery)
         page_buttons = []
         if page > 1:
             page_buttons.append(InlineKeyboardButton("⬅️", callback_data=f"search_channel:{query_id}:{channel_id}:{page - 1}:{mode}"))
-        page_buttons.append(InlineKeyboardButton(f"📃 {page}/{total_pages}", callback_data="noop"))
-        if page < total_pages:
+        total_pages_str = f"{total_pages}+" if total_is_approximate else str(total_pages)
+        page_buttons.append(InlineKeyboardButton(f"📃 {page}/{total_pages_str}", callback_data="noop"))
+        if has_more:
             page_buttons.append(InlineKeyboardButton("➡️", callback_data=f"search_channel:{query_id}:{channel_id}:{page + 1}:{mode}"))
 
         toggle_mode = 1 - mode
@@ -111,15 +104,10 @@ async def send_file_callback(client, callback_query: CallbackQuery):
         file_link = callback_query.matches[0].group(1)
         user_id = callback_query.from_user.id
 
-        padding = '=' * (-len(file_link) % 4)
-        decoded = base64.urlsafe_b64decode(file_link + padding).decode()
-        channel_id, msg_id = map(int, decoded.split("_"))
+        channel_id, msg_id = bot.decode_file_link(file_link)
 
-        if not is_user_authorized(user_id):
-            now = datetime.now(timezone.utc)
-            token_doc = tokens_col.find_one({"user_id": user_id, "expiry": {"$gt": now}})
-            token_id = token_doc["token_id"] if token_doc else generate_token(user_id)
-            short_link = await shorten_url(get_token_link(token_id, BOT_USERNAME))
+        if not await is_user_authorized(user_id):
+            short_link = await get_unlock_link(user_id)
             await safe_api_call(callback_query.edit_message_text(
                 text="To get this file, you'll need to unlock access first. Just tap the button below!",
                 reply_markup=InlineKeyboardMarkup(
@@ -128,37 +116,8 @@ async def send_file_callback(client, callback_query: CallbackQuery):
             ))
             return
 
-        if bot.user_file_count.get(user_id, 0) >= bot.MAX_FILES_PER_SESSION:
-            await safe_api_call(callback_query.answer(
-                "You've requested a lot of files! Please wait a moment before trying again. 😊",
-                show_alert=True
-            ))
-            return
-
-        file_doc = files_col.find_one({"channel_id": channel_id, "message_id": msg_id})
-        if not file_doc:
-            await callback_query.answer("I couldn't find that file. It might have been removed.", show_alert=True)
-            return
-
-        file_name = file_doc.get("file_name", "Unknown File")
-
-        copy_msg = await safe_api_call(client.copy_message(
-            chat_id=user_id,
-            from_chat_id=file_doc["channel_id"],
-            message_id=file_doc["message_id"],
-            caption=f"🎥 <b>{file_name}</b>"
-        ))
-
-        if copy_msg:
-            bot.user_file_count[user_id] = bot.user_file_count.get(user_id, 0) + 1
-            await safe_api_call(callback_query.answer(
-                "File will delete in few minutes forward it to your saved messages!", show_alert=True
-            ))
-            bot.loop.create_task(delete_after_delay(client, copy_msg.chat.id, copy_msg.id))
-        else:
-            await safe_api_call(callback_query.answer(
-                "Failed to send file. Please try again later.", show_alert=True
-            ))
+        status = await send_file_to_user(bot, user_id, channel_id, msg_id)
+        await safe_api_call(callback_query.answer(FILE_STATUS_TEXT[status], show_alert=True))
 
     except Exception as e:
         logger.error(f"Error in send_file_callback: {e}")
@@ -169,7 +128,7 @@ async def view_file_callback_handler(client, callback_query: CallbackQuery):
         channel_id = int(callback_query.matches[0].group(1))
         message_id = int(callback_query.matches[0].group(2))
 
-        file_doc = files_col.find_one({"channel_id": channel_id, "message_id": message_id})
+        file_doc = await files_col.find_one({"channel_id": channel_id, "message_id": message_id})
         if not file_doc:
             await callback_query.answer("❌ File not found!", show_alert=True)
             return
@@ -1,15 +1,20 @@
 
+import io
 import os
 import sys
+import html
+import asyncio
 import logging
+from datetime import datetime, timezone, timedelta
 from bson import ObjectId
 from pyrogram.errors import UserIsBlocked, InputUserDeactivated, ListenerTimeout, PeerIdInvalid, UserIsBot
 
 from pyrogram import filters, enums
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 
-from config import OWNER_ID, LOG_CHANNEL_ID, UPDATE_CHANNEL_ID
-from db import files_col, allowed_channels_col, auth_users_col, users_col, tmdb_col, db
+from config import OWNER_ID, LOG_CHANNEL_ID, UPDATE_CHANNEL_ID, LOG_FILE, LOG_DEFAULT_MB
+from log_pipeline import parse_log_range, read_log_tail, read_log_window, stop_logging
+from db import files_col, allowed_channels_col, auth_users_col, users_col, tmdb_col, db, iter_batches, index_usage_report
 from utility import (
     extract_channel_and_msg_id,
     get_allowed_channels,
@@ -18,11 +23,32 @@ from utility import (
     auto_delete_message,
     safe_api_call,
     remove_unwanted,
-    restore_tmdb_photos,
     human_readable_size,
     extract_tmdb_link,
-    get_info,
+    get_tmdb_post,
+    send_tmdb_post,
+    delete_file_info,
 )
+from indexer import (
+    running_index_jobs,
+    create_index_job,
+    start_index_job,
+    attach_index_job,
+    get_running_index_job,
+    format_index_job,
+)
+from restorer import (
+    running_restore_jobs,
+    create_restore_job,
+    get_resumable_restore_job,
+    start_restore_job,
+    format_restore_job,
+)
+from rate_limiter import api_limiter, bulk_priority
+from tmdb_cache import tmdb_cache
+from loop_monitor import loop_monitor
+from profiler import profile_lock, profile_event_loop, format_profile_report, collapsed_stacks, MAX_PROFILE_SECONDS
+from title_resolver import title_resolver
 from app import bot
 
 logger = logging.getLogger(__name__)
@@ -34,12 +60,11 @@ async def del_file_handler(client, message):
         channel_id = message.forward_from_chat.id if message.forward_from_chat else None
         msg_id = message.forward_from_message_id if message.forward_from_message_id else None
         if channel_id and msg_id:
-            file_doc = files_col.find_one({"channel_id": channel_id, "message_id": msg_id})
+            file_doc = await files_col.find_one({"channel_id": channel_id, "message_id": msg_id})
             if not file_doc:
                 reply = await message.reply_text("No file found with that name in the database.")
                 return
-            result = files_col.delete_one({"channel_id": channel_id, "message_id": msg_id})
-            if result.deleted_count > 0:
+            if await delete_file_info(channel_id, msg_id) > 0:
                 reply = await message.reply_text(f"Database record deleted. File name: {file_doc['file_name']}")
         else:
             reply = await message.reply_text("Please forward a file from a channel to delete its record.")
@@ -90,47 +115,48 @@ async def copy_file_handler(client, message):
         failed = 0
 
         async with bot.copy_lock:
-            for idx, msg_id in enumerate(range(start_id, end_id + 1), start=1):
-                try:
-                    msg = await safe_api_call(client.get_messages(source_channel_id, msg_id))
-                    if not msg:
-                        continue
-
-                    media = msg.document or msg.video or msg.audio
-                    if not media:
-                        continue  # Skip non-media messages
-
-                    caption = msg.caption or getattr(media, "file_name", "No Caption")
-                    caption = remove_unwanted(caption)
-
-                    copied_msg = await safe_api_call(client.copy_message(
-                        chat_id=dest_channel_id,
-                        from_chat_id=source_channel_id,
-                        message_id=msg_id,
-                        caption=f"<b>{caption}</b>"
-                    ))
-
-                    count += 1
-
-                    if copied_msg:
-                        await queue_file_for_processing(
-                            copied_msg,
-                            channel_id=dest_channel_id,
-                            reply_func=message.reply_text,
-                            duplicate=True
-                        )
-
-                    if idx % 10 == 0 or idx == total:
-                        await safe_api_call(status_msg.edit_text(
-                            f"🔁 <b>Copying in progress...</b>\n"
-                            f"✅ <b>{count}</b> files copied so far.\n"
-                            f"📂 <i>{idx}/{total} messages checked</i>"
+            with bulk_priority():
+                for idx, msg_id in enumerate(range(start_id, end_id + 1), start=1):
+                    try:
+                        msg = await safe_api_call(client.get_messages(source_channel_id, msg_id))
+                        if not msg:
+                            continue
+
+                        media = msg.document or msg.video or msg.audio
+                        if not media:
+                            continue  # Skip non-media messages
+
+                        caption = msg.caption or getattr(media, "file_name", "No Caption")
+                        caption = remove_unwanted(caption)
+
+                        copied_msg = await safe_api_call(client.copy_message(
+                            chat_id=dest_channel_id,
+                            from_chat_id=source_channel_id,
+                            message_id=msg_id,
+                            caption=f"<b>{caption}</b>"
                         ))
 
-                except Exception as copy_error:
-                    failed += 1
-                    logger.warning(f"[copy_file_handler] Failed to copy message {msg_id}: {copy_error}")
-                    continue
+                        count += 1
+
+                        if copied_msg:
+                            await queue_file_for_processing(
+                                copied_msg,
+                                channel_id=dest_channel_id,
+                                reply_func=message.reply_text,
+                                duplicate=True
+                            )
+
+                        if idx % 10 == 0 or idx == total:
+                            await safe_api_call(status_msg.edit_text(
+                                f"🔁 <b>Copying in progress...</b>\n"
+                                f"✅ <b>{count}</b> files copied so far.\n"
+                                f"📂 <i>{idx}/{total} messages checked</i>"
+                            ))
+
+                    except Exception as copy_error:
+                        failed += 1
+                        logger.warning(f"[copy_file_handler] Failed to copy message {msg_id}: {copy_error}")
+                        continue
 
         await safe_api_call(status_msg.edit_text(
             f"✅ <b>Copy completed!</b>\n\n"
@@ -141,7 +167,7 @@ async def copy_file_handler(client, message):
 
         await safe_api_call(bot.delete_messages(OWNER_ID, [start_msg.id, end_msg.id, dest_msg.id, reply.id, message.id]))
 
-        invalidate_search_cache()
+        invalidate_search_cache(dest_channel_id)
     except ListenerTimeout:
         await reply.edit_text("⏰ Timeout! You took too long to reply. Please try again.")
     except Exception as e:
@@ -152,6 +178,14 @@ async def copy_file_handler(client, message):
 @bot.on_message(filters.command("index") & filters.private & filters.user(OWNER_ID))
 async def index_channel_files(client, message):
     dup = False
+    if len(message.command) > 1 and message.command[1].lower() == "status":
+        if not running_index_jobs:
+            await message.reply_text("No indexing job is running.")
+            return
+        for job in list(running_index_jobs.values()):
+            status_msg = await message.reply_text(f"🔁 Indexing in progress...\n{format_index_job(job)}")
+            await attach_index_job(job, status_msg)
+        return
     if len(message.command) > 1 and message.command[1].lower() == "dup":
         dup = True
 
@@ -187,36 +221,15 @@ async def index_channel_files(client, message):
         await message.reply_text(f"Invalid link: {e}")
         return
 
-    reply = await message.reply_text(f"Indexing files from {start_msg_id} to {end_msg_id} in channel {channel_id}... Duplicates allowed: {dup}")
-
-    batch_size = 50
-    count = 0
-    for batch_start in range(start_msg_id, end_msg_id + 1, batch_size):
-        batch_end = min(batch_start + batch_size - 1, end_msg_id)
-        ids = list(range(batch_start, batch_end + 1))
-        messages = []
-        for msg_id in ids:
-            try:
-                msg = await client.get_messages(channel_id, msg_id)
-                messages.append(msg)
-            except Exception as e:
-                logger.warning(f"Could not get message {msg_id}: {e}")
-                continue
-        for msg in messages:
-            if not msg:
-                continue
-            if msg.document or msg.video or msg.audio or msg.photo:
-                await queue_file_for_processing(
-                    msg,
-                    channel_id=channel_id,
-                    reply_func=reply.edit_text,
-                    duplicate=dup
-                )
-                count += 1
-        await safe_api_call(reply.edit_text(f"🔁 Indexing in progress... {count} files queued so far."))
-    await safe_api_call(reply.edit_text(f"✅ Indexing completed! Total files queued: {count}"))
+    running_job = get_running_index_job(channel_id)
+    if running_job:
+        reply = await message.reply_text(f"🔁 This channel is already being indexed.\n{format_index_job(running_job)}")
+        await attach_index_job(running_job, reply)
+    else:
+        reply = await message.reply_text(f"Indexing files from {start_msg_id} to {end_msg_id} in channel {channel_id}... Duplicates allowed: {dup}")
+        job = await create_index_job(channel_id, start_msg_id, end_msg_id, dup, reply)
+        start_index_job(client, job)
     await bot.delete_messages(OWNER_ID, [start_msg.id, end_msg.id, prompt.id, prompt2.id, message.id])
-    invalidate_search_cache()
 
 @bot.on_message(filters.private & filters.command("del") & filters.user(OWNER_ID))
 async def delete_command(client, message):
@@ -239,13 +252,10 @@ async def delete_command(client, message):
                         return
                     if msg_id > end_msg_id:
                         msg_id, end_msg_id = end_msg_id, msg_id
-                    result = files_col.delete_many({
-                        "channel_id": channel_id,
-                        "message_id": {"$gte": msg_id, "$lte": end_msg_id}
-                    })
-                    await message.reply_text(f"Deleted {result.deleted_count} files from {msg_id} to {end_msg_id} in channel {channel_id}.")
+                    deleted_count = await delete_file_info(channel_id, msg_id, end_msg_id)
+                    await message.reply_text(f"Deleted {deleted_count} files from {msg_id} to {end_msg_id} in channel {channel_id}.")
                 else:
-                    result = files_col.delete_one({"channel_id": channel_id, "message_id": msg_id})
+                    await delete_file_info(channel_id, msg_id)
                     await message.reply_text(f"Deleted file with message ID {msg_id} in channel {channel_id}.")
             except ValueError as e:
                 await message.reply_text(f"Error: {e}")
@@ -257,7 +267,7 @@ async def delete_command(client, message):
                 else:
                     tmdb_type, tmdb_id = await extract_tmdb_link(user_input)
 
-                result = tmdb_col.delete_one({"tmdb_type": tmdb_type, "tmdb_id": tmdb_id})
+                result = await tmdb_col.delete_one({"tmdb_type": tmdb_type, "tmdb_id": tmdb_id})
 
                 if result.deleted_count > 0:
                     await message.reply_text(f"Database record deleted: {tmdb_type}/{tmdb_id}.")
@@ -275,27 +285,47 @@ async def delete_command(client, message):
 async def restart(client, message):
     await message.delete()
     os.system("python3 update.py")
+    stop_logging()
     os.execl(sys.executable, sys.executable, "bot.py")
 
 @bot.on_message(filters.private & filters.command("restore") & filters.user(OWNER_ID))
 async def update_info(client, message):
     try:
         args = message.text.split()
-        if len(args) < 2:
-            await message.reply_text("Usage: /restore tmdb [start_objectid]")
+        if len(args) < 2 or args[1].strip() != "tmdb":
+            await message.reply_text("Usage: /restore tmdb [start_objectid | resume | status]")
             return
-        restore_type = args[1].strip()
-        start_id = args[2] if len(args) > 2 else None
-        if start_id:
-            try:
-                start_id = ObjectId(start_id)
-            except Exception:
-                await message.reply_text("Invalid ObjectId format for start_id.")
+        option = args[2] if len(args) > 2 else None
+
+        if option == "status":
+            if not running_restore_jobs:
+                await message.reply_text("No restore is running.")
+                return
+            for job in running_restore_jobs.values():
+                await message.reply_text(format_restore_job(job), parse_mode=enums.ParseMode.HTML)
+            return
+
+        if running_restore_jobs:
+            await message.reply_text("A restore is already running. Use /restore tmdb status.")
+            return
+
+        if option == "resume":
+            status_message = await message.reply_text("🔁 Resuming TMDB restore...")
+            job = await get_resumable_restore_job(status_message)
+            if not job:
+                await status_message.edit_text("No interrupted restore to resume.")
                 return
-        if restore_type == "tmdb":
-            await restore_tmdb_photos(bot, start_id)
         else:
-            await message.reply_text("Invalid restore type. Use 'tmdb'.")
+            start_id = None
+            if option:
+                try:
+                    start_id = ObjectId(option)
+                except Exception:
+                    await message.reply_text("Invalid ObjectId format for start_id.")
+                    return
+            status_message = await message.reply_text("🔁 Starting TMDB restore...")
+            job = await create_restore_job(start_id, status_message)
+        start_restore_job(client, job)
     except Exception as e:
         logger.error(f"Error in update_info: {e}")
         await message.reply_text(f"Error in Update Command: {e}")
@@ -308,7 +338,7 @@ async def add_channel_handler(client, message: Message):
     try:
         channel_id = int(message.command[1])
         channel_name = " ".join(message.command[2:])
-        allowed_channels_col.update_one(
+        await allowed_channels_col.update_one(
             {"channel_id": channel_id},
             {"$set": {"channel_id": channel_id, "channel_name": channel_name}},
             upsert=True
@@ -327,7 +357,7 @@ async def remove_channel_handler(client, message: Message):
         return
     try:
         channel_id = int(message.command[1])
-        result = allowed_channels_col.delete_one({"channel_id": channel_id})
+        result = await allowed_channels_col.delete_one({"channel_id": channel_id})
         if result.deleted_count:
             await message.reply_text(f"✅ Channel {channel_id} removed from allowed channels.")
         else:
@@ -341,69 +371,144 @@ async def remove_channel_handler(client, message: Message):
 @bot.on_message(filters.command("broadcast") & filters.chat(LOG_CHANNEL_ID))
 async def broadcast_handler(client, message: Message):
     if message.reply_to_message:
-        users = users_col.find({}, {"_id": 0, "user_id": 1})
+        users = iter_batches(users_col, projection={"_id": 1, "user_id": 1})
         total = 0
         failed = 0
         removed = 0
 
-        for user in users:
-             try:
-                msg = message.reply_to_message
-                if msg.forward_from_chat:
-                     await safe_api_call(msg.copy(chat_id=user["user_id"],
-                                                  caption=f"{msg.caption.html}\n\n✅ <b>Now Available!</b>",
-                                                  reply_markup=msg.reply_markup
-                                        ))
-                else:
-                    await safe_api_call(msg.copy(user["user_id"]))
-                total += 1
-             except (UserIsBlocked, InputUserDeactivated, PeerIdInvalid, UserIsBot):
-                users_col.delete_one({"user_id": user["user_id"]})
-                removed += 1
-             except Exception as e:
-                failed += 1
-                logger.error(f"Error broadcasting to {user['user_id']}: {e}")
+        with bulk_priority():
+            async for user in users:
+                 try:
+                    msg = message.reply_to_message
+                    if msg.forward_from_chat:
+                         await safe_api_call(msg.copy(chat_id=user["user_id"],
+                                                      caption=f"{msg.caption.html}\n\n✅ <b>Now Available!</b>",
+                                                      reply_markup=msg.reply_markup
+                                            ))
+                    else:
+                        await safe_api_call(msg.copy(user["user_id"]))
+                    total += 1
+                 except (UserIsBlocked, InputUserDeactivated, PeerIdInvalid, UserIsBot):
+                    await users_col.delete_one({"user_id": user["user_id"]})
+                    removed += 1
+                 except Exception as e:
+                    failed += 1
+                    logger.error(f"Error broadcasting to {user['user_id']}: {e}")
         await message.reply_text(f"✅ Broadcasted to {total} users.\n❌ Failed: {failed}\n🗑️ Removed: {removed}")
 
 @bot.on_message(filters.command("log") & filters.private & filters.user(OWNER_ID))
 async def send_log_file(client, message: Message):
-    log_file = "bot_log.txt"
     try:
-        if not os.path.exists(log_file):
+        arg = message.text.split(maxsplit=1)[1] if len(message.command) > 1 else f"{LOG_DEFAULT_MB} MB"
+        try:
+            kind, amount = parse_log_range(arg)
+        except ValueError:
+            await safe_api_call(message.reply_text("Usage: /log [N MB | N KB | N m | N h | N d]"))
+            return
+        if not os.path.exists(LOG_FILE):
             await safe_api_call(message.reply_text("Log file not found."))
             return
-        reply = await safe_api_call(client.send_document(message.chat.id, log_file, caption="Here is the log file."))
+        if kind == "bytes":
+            data = await asyncio.to_thread(read_log_tail, LOG_FILE, amount)
+            caption = f"Last {human_readable_size(len(data))} of the log."
+        else:
+            since = datetime.now(timezone.utc) - timedelta(seconds=amount)
+            data = await asyncio.to_thread(read_log_window, LOG_FILE, since)
+            caption = f"Log records since {since:%Y-%m-%d %H:%M:%S} UTC."
+        if not data:
+            await safe_api_call(message.reply_text("No log records in that range."))
+            return
+        document = io.BytesIO(data)
+        document.name = os.path.basename(LOG_FILE)
+        reply = await safe_api_call(client.send_document(message.chat.id, document, caption=caption))
         bot.loop.create_task(auto_delete_message(message, reply))
     except Exception as e:
         logger.error(f"Failed to send log file: {e}")
 
+@bot.on_message(filters.command("profile") & filters.private & filters.user(OWNER_ID))
+async def profile_command(client, message: Message):
+    try:
+        seconds = int(message.command[1]) if len(message.command) > 1 else 10
+    except ValueError:
+        await message.reply_text("Usage: /profile [seconds]")
+        return
+    seconds = max(1, min(seconds, MAX_PROFILE_SECONDS))
+    if profile_lock.locked():
+        await message.reply_text("A profile is already running.")
+        return
+    try:
+        async with profile_lock:
+            status = await message.reply_text(f"⏱️ Profiling the event loop for {seconds}s...")
+            report = await profile_event_loop(seconds)
+        text = format_profile_report(report)
+        await safe_api_call(status.edit_text(f"<pre>{html.escape(text[:4000])}</pre>", parse_mode=enums.ParseMode.HTML))
+        await safe_api_call(client.send_document(
+            message.chat.id,
+            collapsed_stacks(report),
+            caption="Collapsed stacks (flamegraph.pl / speedscope)"
+        ))
+    except Exception as e:
+        logger.error(f"Error in profile_command: {e}")
+        await message.reply_text(f"An error occurred: {e}")
+
+@bot.on_message(filters.command("blocking") & filters.private & filters.user(OWNER_ID))
+async def blocking_command(client, message: Message):
+    try:
+        if len(message.command) > 1 and message.command[1] == "reset":
+            loop_monitor.reset()
+            await message.reply_text("Blocking call stats cleared.")
+            return
+        report = loop_monitor.report()
+        if not report:
+            await message.reply_text(f"No event loop stalls over {loop_monitor.threshold}s recorded.")
+            return
+        text = f"<b>Event loop stalls over {loop_monitor.threshold}s</b> (by time blocked)\n\n"
+        for site, count, seconds, blocked_in in report:
+            text += f"<code>{html.escape(site)}</code>\n{count}x, {seconds:.2f}s, in <code>{html.escape(blocked_in)}</code>\n\n"
+        reply = await message.reply_text(text, parse_mode=enums.ParseMode.HTML)
+        bot.loop.create_task(auto_delete_message(message, reply))
+    except Exception as e:
+        logger.error(f"Error in blocking_command: {e}")
+        await message.reply_text(f"An error occurred: {e}")
+
 @bot.on_message(filters.command("stats") & filters.private & filters.user(OWNER_ID))
 async def stats_command(client, message: Message):
     try:
-        total_auth_users = auth_users_col.count_documents({})
-        total_users = users_col.count_documents({})
+        total_auth_users = await auth_users_col.count_documents({})
+        total_users = await users_col.count_documents({})
 
         pipeline = [
             {"$group": {"_id": None, "total": {"$sum": "$file_size"}}}
         ]
-        result = list(files_col.aggregate(pipeline))
+        result = await (await files_col.aggregate(pipeline)).to_list()
         total_storage = result[0]["total"] if result else 0
 
-        stats = db.command("dbstats")
+        stats = await db.command("dbstats")
         db_storage = stats.get("storageSize", 0)
 
         channel_pipeline = [
             {"$group": {"_id": "$channel_id", "count": {"$sum": 1}}},
             {"$sort": {"count": -1}}
         ]
-        channel_counts = list(files_col.aggregate(channel_pipeline))
-        channel_docs = allowed_channels_col.find({}, {"_id": 0, "channel_id": 1, "channel_name": 1})
+        channel_counts = await (await files_col.aggregate(channel_pipeline)).to_list()
+        channel_docs = await allowed_channels_col.find({}, {"_id": 0, "channel_id": 1, "channel_name": 1}).to_list()
         channel_names = {c["channel_id"]: c.get("channel_name", "") for c in channel_docs}
 
+        api_stats = api_limiter.stats()
+
         text = (
             f"<b>Total auth users:</b> {total_auth_users} / {total_users}\n"
             f"<b>Files size:</b> {human_readable_size(total_storage)}\n"
             f"<b>Database storage used:</b> {db_storage / (1024 * 1024):.2f} MB\n"
+            f"<b>API calls:</b> {api_stats['calls']} | <b>FloodWaits:</b> {api_stats['flood_waits']} "
+            f"({api_stats['flood_wait_seconds']:.0f}s)\n"
+        )
+        for namespace, (memory_hits, mongo_hits, misses) in tmdb_cache.stats().items():
+            text += f"<b>TMDB {namespace} cache:</b> {memory_hits} mem / {mongo_hits} db hits, {misses} misses\n"
+        resolver_stats = title_resolver.stats
+        text += (
+            f"<b>Title lookups:</b> {resolver_stats['lookups']} | <b>shared:</b> {resolver_stats['shared']} "
+            f"| <b>offline:</b> {resolver_stats['offline']} | <b>known misses:</b> {resolver_stats['negative_hits']}\n"
         )
 
         if not channel_counts:
@@ -419,6 +524,21 @@ async def stats_command(client, message: Message):
     except Exception as e:
         logger.error(f"Error in stats_command: {e}")
 
+@bot.on_message(filters.command("indexes") & filters.private & filters.user(OWNER_ID))
+async def index_usage_command(client, message: Message):
+    try:
+        report = await index_usage_report()
+        text = "<b>Index usage</b> (ops since last restart of mongod)\n"
+        for collection_name, indexes in report.items():
+            text += f"\n<b>{collection_name}</b>\n"
+            for name, ops, _ in indexes:
+                text += f"<code>{name}</code>: {ops}\n"
+        reply = await message.reply_text(text, parse_mode=enums.ParseMode.HTML)
+        bot.loop.create_task(auto_delete_message(message, reply))
+    except Exception as e:
+        logger.error(f"Error in index_usage_command: {e}")
+        await message.reply_text(f"An error occurred: {e}")
+
 @bot.on_message(filters.private & filters.command("tmdb") & filters.user(OWNER_ID))
 async def tmdb_command(client, message):
     try:
@@ -428,30 +548,14 @@ async def tmdb_command(client, message):
 
         tmdb_link = message.command[1]
         tmdb_type, tmdb_id = await extract_tmdb_link(tmdb_link)
-        result = await get_info(tmdb_type, tmdb_id)
-        poster_url = result.get('poster_url')
-        trailer = result.get('trailer_url')
-        info = result.get('message')
-        update = {
-            "$setOnInsert": {"tmdb_id": tmdb_id, "tmdb_type": tmdb_type}
-        }
-        tmdb_col.update_one(
-            {"tmdb_id": tmdb_id, "tmdb_type": tmdb_type},
-            update,
-            upsert=True
-        )
-
-        keyboard = InlineKeyboardMarkup(
-            [[InlineKeyboardButton("🎥 Trailer", url=trailer)]]) if trailer else None
-        if poster_url:
-            await safe_api_call(
-                client.send_photo(
-                    UPDATE_CHANNEL_ID,
-                    photo=poster_url,
-                    caption=info,
-                    parse_mode=enums.ParseMode.HTML,
-                    reply_markup=keyboard
-                )
+        post = await get_tmdb_post(tmdb_id, tmdb_type)
+        if post:
+            await send_tmdb_post(client, post)
+        else:
+            await tmdb_col.update_one(
+                {"tmdb_id": tmdb_id, "tmdb_type": tmdb_type},
+                {"$setOnInsert": {"tmdb_id": tmdb_id, "tmdb_type": tmdb_type}},
+                upsert=True
             )
     except ValueError as e:
         await message.reply_text(f"Error: {e}")
@@ -522,7 +626,7 @@ async def block_user_handler(client, message: Message):
         return
     try:
         user_id = int(args[1])
-        users_col.update_one(
+        await users_col.update_one(
             {"user_id": user_id},
             {"$set": {"blocked": True}},
             upsert=True
@@ -542,7 +646,7 @@ async def unblock_user_handler(client, message: Message):
         return
     try:
         user_id = int(args[1])
-        users_col.update_one(
+        await users_col.update_one(
             {"user_id": user_id},
             {"$set": {"blocked": False}},
             upsert=True
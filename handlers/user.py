@@ -12,14 +12,16 @@ from utility import (
     add_user,
     is_token_valid,
     authorize_user,
+    is_user_authorized,
+    get_unlock_link,
+    send_file_to_user,
+    FILE_STATUS_TEXT,
     get_user_link,
     safe_api_call,
     is_user_subscribed,
     auto_delete_message,
     get_allowed_channels,
     queue_file_for_processing,
-    invalidate_search_cache,
-    file_queue,
 )
 from query_helper import store_query
 from app import bot
@@ -34,7 +36,7 @@ async def start_handler(client, message):
         user_link = await get_user_link(message.from_user)
         first_name = message.from_user.first_name or "there"
         username = message.from_user.username or None
-        user_doc = add_user(user_id)
+        user_doc = await add_user(user_id)
 
         if user_doc["_new"]:
             log_msg = f"👤 New user added:\nID: <code>{user_id}</code>\n"
@@ -50,13 +52,27 @@ async def start_handler(client, message):
             return
 
         if len(message.command) == 2 and message.command[1].startswith("token_"):
-            if is_token_valid(message.command[1][6:], user_id):
-                authorize_user(user_id)
+            if await is_token_valid(message.command[1][6:], user_id):
+                await authorize_user(user_id)
                 reply_msg = await safe_api_call(message.reply_text("Great! You're all set to get files. ✅"))
                 await safe_api_call(bot.send_message(LOG_CHANNEL_ID, f"✅ User <b>{user_link} | <code>{user_id}</code></b> authorized via @{BOT_USERNAME}"))
             else:
                 reply_msg = await safe_api_call(message.reply_text("Oh no! It looks like your access key is invalid or has expired. Please get a new one. 🔑"))
                 await safe_api_call(bot.send_message(LOG_CHANNEL_ID, f"❌ User <b>{user_link} | <code>{user_id}</code></b> used invalid or expired token."))
+        elif len(message.command) == 2 and message.command[1].startswith("file_"):
+            # Deep link from generate_telegram_link (e.g. /search API results)
+            channel_id, msg_id = bot.decode_file_link(message.command[1][5:])
+            if not await is_user_authorized(user_id):
+                short_link = await get_unlock_link(user_id)
+                reply_msg = await safe_api_call(message.reply_text(
+                    "To get this file, you'll need to unlock access first. Just tap the button below!",
+                    reply_markup=InlineKeyboardMarkup(
+                        [[InlineKeyboardButton("🔓 Unlock Now", url=short_link)]]
+                    )
+                ))
+            else:
+                status = await send_file_to_user(bot, user_id, channel_id, msg_id)
+                reply_msg = await safe_api_call(message.reply_text(FILE_STATUS_TEXT[status]))
         else:
             welcome_text = (
                 f"Hi <b>{first_name}</b>, welcome! 👋\n\n"
@@ -81,15 +97,15 @@ async def channel_file_handler(client, message):
         if message.chat.id not in allowed_channels:
             return
 
+        # Returns as soon as the file is queued; the writer invalidates this
+        # channel's cached results (debounced) once the file is saved.
         await queue_file_for_processing(message)
-        await file_queue.join()
-        invalidate_search_cache()
     except Exception as e:
         logger.error(f"Error in channel_file_handler: {e}")
 
 @bot.on_message(filters.private & filters.text & ~filters.command([
     "start", "stats", "add", "rm", "broadcast", "log", "tmdb",
-    "restore", "index", "del", "restart", "op", "block", "unblock", "revoke"]))
+    "restore", "index", "del", "restart", "op", "block", "unblock", "revoke", "indexes", "profile", "blocking"]))
 async def instant_search_handler(client, message):
     reply = None
     user_id = message.from_user.id
@@ -103,7 +119,7 @@ async def instant_search_handler(client, message):
             return
 
         query_id = store_query(query)
-        user_doc = add_user(user_id)
+        user_doc = await add_user(user_id)
         if user_doc.get("blocked", True):
             return
 
@@ -123,7 +139,7 @@ async def instant_search_handler(client, message):
             bot.loop.create_task(auto_delete_message(message, reply))
             return
 
-        channels = list(allowed_channels_col.find({}, {"_id": 0, "channel_id": 1, "channel_name": 1}))
+        channels = await allowed_channels_col.find({}, {"_id": 0, "channel_id": 1, "channel_name": 1}).to_list()
         if not channels:
             await safe_api_call(reply.edit_text("I couldn't find any channels to search in. Please check back later!"))
             return
@@ -0,0 +1,82 @@
+import time
+import asyncio
+import logging
+import aiohttp
+from urllib.parse import urlsplit
+from config import HTTP_TIMEOUT, HTTP_RETRIES, HTTP_POOL_SIZE, HTTP_POOL_PER_HOST
+from metrics import HTTP_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Retried after a short backoff; anything else is returned to the caller
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class HttpClient:
+    """
+    Application-wide aiohttp session: pooled keep-alive connections, cached DNS,
+    per-host limits, one timeout policy and retries for every outbound request.
+    """
+
+    def __init__(self, timeout=HTTP_TIMEOUT, retries=HTTP_RETRIES, limit=HTTP_POOL_SIZE, limit_per_host=HTTP_POOL_PER_HOST):
+        self.timeout = timeout
+        self.retries = retries
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self._session = None
+
+    async def start(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=300,
+                keepalive_timeout=60,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def fetch(self, url, params=None, as_json=True):
+        """
+        GET a URL and return (status, body), with body parsed as JSON or text.
+        Connection errors, timeouts and RETRY_STATUSES are retried with backoff;
+        the last error is raised once retries are exhausted.
+        """
+        session = await self.start()
+        host = urlsplit(url).hostname or ""
+        for attempt in range(self.retries + 1):
+            start = time.perf_counter()
+            try:
+                async with session.get(url, params=params) as response:
+                    if response.status in RETRY_STATUSES and attempt < self.retries:
+                        raise aiohttp.ClientResponseError(
+                            response.request_info, response.history, status=response.status
+                        )
+                    body = await response.json(content_type=None) if as_json else await response.text()
+                    HTTP_SECONDS.labels(host, str(response.status)).observe(time.perf_counter() - start)
+                    return response.status, body
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status = getattr(e, "status", None) or type(e).__name__
+                HTTP_SECONDS.labels(host, str(status)).observe(time.perf_counter() - start)
+                if attempt >= self.retries:
+                    raise
+                logger.warning(f"HTTP GET {url} failed ({e!r}), retrying")
+                await asyncio.sleep(0.5 * 2 ** attempt)
+
+    async def get_json(self, url, params=None):
+        _, data = await self.fetch(url, params=params)
+        return data
+
+    async def get_text(self, url, params=None):
+        return await self.fetch(url, params=params, as_json=False)
+
+
+http = HttpClient()
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from pyrogram import raw, utils
+from pyrogram.errors import FloodWait
+from config import INDEX_BATCH_SIZE, INDEX_FETCH_RETRIES
+from db import jobs_col
+from utility import queue_file_for_processing, invalidate_search_cache, safe_api_call
+
+logger = logging.getLogger(__name__)
+
+# Index jobs running in this process: {job_id: job document}
+running_index_jobs = {}
+# Their tasks; the loop only keeps weak references to tasks
+index_job_tasks = set()
+
+async def get_message_batch(client, channel_id, ids):
+    """
+    channels.GetMessages for one batch, with FloodWaits raised to the caller
+    rather than slept through by the session (get_messages uses sleep_threshold=-1)
+    or retried by Bot.invoke.
+    """
+    peer = await client.resolve_peer(channel_id)
+    r = await client.invoke(
+        raw.functions.channels.GetMessages(channel=peer, id=[raw.types.InputMessageID(id=i) for i in ids]),
+        sleep_threshold=0,
+        flood_retries=0
+    )
+    return await utils.parse_messages(client, r)
+
+async def fetch_message_batch(client, channel_id, ids, pacing, retries=INDEX_FETCH_RETRIES):
+    """
+    Fetch a batch of messages in one request.
+    `pacing` is a dict holding the adaptive inter-batch delay; FloodWaits are waited
+    out, retried and slow down later batches, clean batches speed them back up.
+    Other errors are retried with exponential backoff; once `retries` attempts
+    have failed the last error is raised, so the caller never checkpoints past
+    a batch it could not read.
+    """
+    attempt = 0
+    while True:
+        try:
+            messages = await get_message_batch(client, channel_id, ids)
+            pacing["delay"] = pacing["delay"] * 0.5 if pacing["delay"] > 0.1 else 0
+            return messages
+        except FloodWait as e:
+            logger.warning(f"FloodWait {e.value}s while indexing {ids[0]}-{ids[-1]}")
+            await asyncio.sleep(e.value)
+            pacing["delay"] = min(max(pacing["delay"] * 2, 1), 30)
+        except Exception as e:
+            attempt += 1
+            if attempt >= retries:
+                raise
+            backoff = min(2 ** attempt, 60)
+            logger.warning(f"Could not get messages {ids[0]}-{ids[-1]} (attempt {attempt}/{retries}), retrying in {backoff}s: {e}")
+            await asyncio.sleep(backoff)
+
+def format_index_job(job):
+    done = max(job["last_id"] - job["start_id"] + 1, 0)
+    total = job["end_id"] - job["start_id"] + 1
+    return (
+        f"Channel <code>{job['channel_id']}</code>: {job['start_id']} → {job['end_id']}\n"
+        f"📂 {done}/{total} messages scanned (last committed: {job['last_id']})\n"
+        f"✅ {job['saved']} saved, ⚠️ {job['duplicates']} duplicates, ❌ {job['failed']} failed"
+    )
+
+async def update_index_job_status(client, job, header):
+    if not job.get("status_message_id"):
+        return
+    await safe_api_call(client.edit_message_text(
+        job["status_chat_id"],
+        job["status_message_id"],
+        f"{header}\n{format_index_job(job)}"
+    ))
+
+async def create_index_job(channel_id, start_id, end_id, dup, status_message):
+    now = datetime.now(timezone.utc)
+    job = {
+        "type": "index",
+        "status": "running",
+        "channel_id": channel_id,
+        "start_id": start_id,
+        "end_id": end_id,
+        "last_id": start_id - 1,
+        "dup": dup,
+        "saved": 0,
+        "duplicates": 0,
+        "failed": 0,
+        "status_chat_id": status_message.chat.id,
+        "status_message_id": status_message.id,
+        "created_at": now,
+        "updated_at": now,
+    }
+    result = await jobs_col.insert_one(job)
+    job["_id"] = result.inserted_id
+    return job
+
+async def attach_index_job(job, status_message):
+    """Point a running job's progress updates at a new status message."""
+    job["status_chat_id"] = status_message.chat.id
+    job["status_message_id"] = status_message.id
+    await jobs_col.update_one(
+        {"_id": job["_id"]},
+        {"$set": {"status_chat_id": job["status_chat_id"], "status_message_id": job["status_message_id"]}}
+    )
+
+async def run_index_job(client, job):
+    """
+    Scan a job's message range from its high-watermark.
+    A batch is only checkpointed after every file in it has been written, so a
+    crash or restart resumes from the last committed batch.
+    """
+    running_index_jobs[job["_id"]] = job
+    pacing = {"delay": 0}
+    channel_id = job["channel_id"]
+    try:
+        for batch_start in range(job["last_id"] + 1, job["end_id"] + 1, INDEX_BATCH_SIZE):
+            batch_end = min(batch_start + INDEX_BATCH_SIZE - 1, job["end_id"])
+            messages = await fetch_message_batch(client, channel_id, list(range(batch_start, batch_end + 1)), pacing)
+
+            pending = []
+            for msg in messages:
+                if not msg or msg.empty:
+                    continue
+                if msg.document or msg.video or msg.audio or msg.photo:
+                    done = await queue_file_for_processing(msg, channel_id=channel_id, duplicate=job["dup"])
+                    if done:
+                        pending.append(done)
+
+            counts = {"saved": 0, "duplicates": 0, "failed": 0}
+            for status in await asyncio.gather(*pending):
+                counts["duplicates" if status == "duplicate" else status] += 1
+
+            job["last_id"] = batch_end
+            for key, value in counts.items():
+                job[key] += value
+            await jobs_col.update_one(
+                {"_id": job["_id"]},
+                {
+                    "$set": {"last_id": batch_end, "updated_at": datetime.now(timezone.utc)},
+                    "$inc": counts
+                }
+            )
+            await update_index_job_status(client, job, "🔁 Indexing in progress...")
+            if pacing["delay"]:
+                await asyncio.sleep(pacing["delay"])
+
+        job["status"] = "done"
+        await jobs_col.update_one({"_id": job["_id"]}, {"$set": {"status": "done", "updated_at": datetime.now(timezone.utc)}})
+        await update_index_job_status(client, job, "✅ Indexing completed!")
+    except asyncio.CancelledError:
+        # Shutdown: leave the job "running" so it resumes on the next start
+        raise
+    except Exception as e:
+        logger.error(f"Index job {job['_id']} failed: {e}")
+        job["status"] = "failed"
+        await jobs_col.update_one({"_id": job["_id"]}, {"$set": {"status": "failed", "error": str(e)}})
+        await update_index_job_status(client, job, f"❌ Indexing failed: {e}")
+    finally:
+        running_index_jobs.pop(job["_id"], None)
+        invalidate_search_cache(channel_id)
+
+def start_index_job(client, job):
+    task = client.loop.create_task(run_index_job(client, job))
+    index_job_tasks.add(task)
+    task.add_done_callback(index_job_tasks.discard)
+    return task
+
+def get_running_index_job(channel_id):
+    return next((job for job in running_index_jobs.values() if job["channel_id"] == channel_id), None)
+
+async def resume_index_jobs(client):
+    """Restart every index job left running by a crash or /restart."""
+    async for job in jobs_col.find({"type": "index", "status": "running"}):
+        if job["_id"] in running_index_jobs:
+            continue
+        logger.info(f"Resuming index job {job['_id']} from message {job['last_id'] + 1}")
+        start_index_job(client, job)
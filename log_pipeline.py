@@ -0,0 +1,151 @@
+import os
+import re
+import json
+import queue
+import atexit
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+
+TEXT_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+TEXT_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# The QueueListener started by setup_logging
+active_listener = None
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts (UTC ISO-8601), level, logger, message."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def build_file_handler(log_file, max_bytes, backup_count, rotate_when):
+    if rotate_when:
+        return logging.handlers.TimedRotatingFileHandler(
+            log_file, when=rotate_when, backupCount=backup_count, encoding="utf-8", utc=True
+        )
+    return logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+    )
+
+
+def setup_logging(log_file, level=logging.INFO, max_bytes=10 * 1024 * 1024, backup_count=5, rotate_when="", json_format=False):
+    """
+    Route every log record through a QueueHandler; a QueueListener thread does
+    the formatting and the console/file I/O, so logging never blocks the loop.
+    Replaces any handlers already on the root logger. Returns the listener.
+    """
+    formatter = JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT)
+    file_handler = build_file_handler(log_file, max_bytes, backup_count, rotate_when)
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+
+    global active_listener
+    if active_listener is not None:
+        active_listener.stop()
+    listener.start()
+    atexit.register(stop_logging)
+    active_listener = listener
+    return listener
+
+
+def stop_logging():
+    """Write out every queued record and stop the listener (before exit or exec)."""
+    global active_listener
+    if active_listener is not None:
+        active_listener.stop()
+        active_listener = None
+
+
+def log_files(log_file):
+    """The current log file and its rotated backups, oldest first."""
+    directory = os.path.dirname(os.path.abspath(log_file))
+    base = os.path.basename(log_file)
+    rotated = [
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.startswith(base + ".")
+    ]
+    rotated.sort(key=os.path.getmtime)
+    return rotated + ([log_file] if os.path.exists(log_file) else [])
+
+
+def read_log_tail(log_file, max_bytes):
+    """Return the last `max_bytes` of the log, reaching into rotated files if needed."""
+    chunks = []
+    remaining = max_bytes
+    for path in reversed(log_files(log_file)):
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            f.seek(max(size - remaining, 0))
+            chunks.append(f.read(remaining))
+        remaining -= min(size, remaining)
+        if remaining <= 0:
+            break
+    data = b"".join(reversed(chunks))
+    # Drop the partial first line unless the whole log fit
+    if remaining <= 0 and b"\n" in data:
+        data = data.split(b"\n", 1)[1]
+    return data
+
+
+def record_time(line):
+    """Timestamp of a log line in either format, or None for continuation lines (tracebacks)."""
+    try:
+        if line.startswith("{"):
+            return datetime.fromisoformat(json.loads(line)["ts"])
+        return datetime.strptime(line[:19], TEXT_TIME_FORMAT).astimezone(timezone.utc)
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def read_log_window(log_file, since):
+    """Return every record logged at or after `since` (aware datetime), with its continuation lines."""
+    lines = []
+    include = False
+    for path in log_files(log_file):
+        if os.path.getmtime(path) < since.timestamp():
+            continue
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                stamp = record_time(line)
+                if stamp is not None:
+                    include = stamp >= since
+                if include:
+                    lines.append(line)
+    return "".join(lines).encode("utf-8")
+
+
+# "/log 5 MB", "/log 500kb", "/log 30m", "/log 2 h", "/log 1d"
+LOG_SIZE_UNITS = {"kb": 1024, "mb": 1024 * 1024}
+LOG_TIME_UNITS = {"m": 60, "min": 60, "h": 3600, "d": 86400}
+LOG_RANGE_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*(kb|mb|min|m|h|d)\s*$", re.IGNORECASE)
+
+def parse_log_range(text):
+    """Parse "N MB"/"N KB" into ("bytes", n) or "N m|h|d" into ("seconds", n). Raises ValueError."""
+    match = LOG_RANGE_RE.match(text or "")
+    if not match:
+        raise ValueError(f"invalid log range: {text!r}")
+    amount, unit = float(match.group(1)), match.group(2).lower()
+    if unit in LOG_SIZE_UNITS:
+        return "bytes", int(amount * LOG_SIZE_UNITS[unit])
+    return "seconds", amount * LOG_TIME_UNITS[unit]
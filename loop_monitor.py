@@ -0,0 +1,114 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import Counter
+from config import LOOP_MONITOR_INTERVAL, LOOP_BLOCK_THRESHOLD
+from metrics import LOOP_LAG_SECONDS, LOOP_BLOCKS, LOOP_BLOCKED_SECONDS
+
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def blocking_site(frame):
+    """
+    Attribute a stalled stack to a call site: the innermost frame in this
+    project (the code that made the blocking call), plus the innermost frame
+    overall (what it was blocked in).
+    """
+    summary = traceback.extract_stack(frame)
+    innermost = summary[-1]
+    site = next(
+        (f for f in reversed(summary) if f.filename.startswith(PROJECT_DIR) and f.filename != __file__),
+        innermost
+    )
+    where = f"{os.path.relpath(site.filename, PROJECT_DIR) if site.filename.startswith(PROJECT_DIR) else site.filename}:{site.lineno} {site.name}"
+    blocked_in = f"{innermost.filename.rsplit('/', 1)[-1]}:{innermost.lineno} {innermost.name}"
+    return where, blocked_in, "".join(summary.format())
+
+
+class LoopMonitor:
+    """
+    Event-loop watchdog. A heartbeat task records scheduling lag; a side thread
+    notices when the heartbeat stops for longer than LOOP_BLOCK_THRESHOLD and
+    captures the loop thread's stack at that moment, counted by call site.
+    """
+
+    def __init__(self, interval=LOOP_MONITOR_INTERVAL, threshold=LOOP_BLOCK_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self.last_beat = time.monotonic()
+        self.loop_thread_id = None
+        self.blocks = Counter()
+        self.blocked_seconds = Counter()
+        self.examples = {}
+        self._stalled_site = None
+        self._task = None
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def start(self, loop=None):
+        if self._task is not None:
+            return
+        loop = loop or asyncio.get_running_loop()
+        self._task = loop.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _heartbeat(self):
+        self.loop_thread_id = threading.get_ident()
+        while True:
+            start = time.monotonic()
+            self.last_beat = start
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.last_beat = now
+            lag = max(now - start - self.interval, 0)
+            LOOP_LAG_SECONDS.observe(lag)
+            site = self._stalled_site
+            if site is not None:
+                self._stalled_site = None
+                self.blocked_seconds[site] += lag
+                LOOP_BLOCKED_SECONDS.labels(site).inc(lag)
+
+    def _watch(self):
+        while not self._stop_event.wait(self.interval / 2):
+            if self.loop_thread_id is None or self._stalled_site is not None:
+                continue
+            stalled = time.monotonic() - self.last_beat - self.interval
+            if stalled < self.threshold:
+                continue
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is None:
+                continue
+            site, blocked_in, stack = blocking_site(frame)
+            self._stalled_site = site
+            self.blocks[site] += 1
+            self.examples[site] = (blocked_in, stack)
+            LOOP_BLOCKS.labels(site).inc()
+            logger.warning(f"Event loop blocked for {stalled:.2f}s+ at {site} (in {blocked_in})")
+
+    def report(self, top=10):
+        """[(site, count, blocked seconds, blocked_in)] ordered by time blocked."""
+        return [
+            (site, self.blocks[site], self.blocked_seconds[site], self.examples[site][0])
+            for site in sorted(self.blocks, key=lambda s: (self.blocked_seconds[s], self.blocks[s]), reverse=True)[:top]
+        ]
+
+    def reset(self):
+        self.blocks.clear()
+        self.blocked_seconds.clear()
+        self.examples.clear()
+
+
+loop_monitor = LoopMonitor()
@@ -0,0 +1,128 @@
+import time
+import functools
+from pymongo import monitoring
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+registry = CollectorRegistry()
+
+HANDLER_SECONDS = Histogram(
+    "tgbot_handler_seconds", "Time spent in Telegram update handlers",
+    ["handler"], registry=registry
+)
+HANDLER_ERRORS = Counter(
+    "tgbot_handler_errors_total", "Exceptions escaping Telegram update handlers",
+    ["handler"], registry=registry
+)
+MONGO_SECONDS = Histogram(
+    "tgbot_mongo_command_seconds", "MongoDB command latency",
+    ["collection", "command"], registry=registry
+)
+MONGO_FAILURES = Counter(
+    "tgbot_mongo_command_failures_total", "Failed MongoDB commands",
+    ["collection", "command"], registry=registry
+)
+QUEUE_DEPTH = Gauge(
+    "tgbot_queue_depth", "Items waiting in the file pipeline queues",
+    ["queue"], registry=registry
+)
+STAGE_SECONDS = Histogram(
+    "tgbot_pipeline_stage_seconds", "Time spent per file pipeline stage",
+    ["stage"], registry=registry
+)
+TELEGRAM_SECONDS = Histogram(
+    "tgbot_telegram_call_seconds", "Telegram API call latency, including rate-limit waits",
+    ["method"], registry=registry
+)
+TELEGRAM_CALLS = Counter(
+    "tgbot_telegram_calls_total", "Telegram API calls",
+    ["method"], registry=registry
+)
+TELEGRAM_FLOOD_WAIT_SECONDS = Counter(
+    "tgbot_telegram_flood_wait_seconds_total", "Seconds of FloodWait imposed by Telegram",
+    ["method"], registry=registry
+)
+HTTP_SECONDS = Histogram(
+    "tgbot_http_request_seconds", "Outbound HTTP request latency",
+    ["host", "status"], registry=registry
+)
+LOOP_LAG_SECONDS = Histogram(
+    "tgbot_loop_lag_seconds", "How late the event loop wakes the monitor heartbeat",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10), registry=registry
+)
+LOOP_BLOCKS = Counter(
+    "tgbot_loop_blocks_total", "Event loop stalls over the threshold, by call site",
+    ["site"], registry=registry
+)
+LOOP_BLOCKED_SECONDS = Counter(
+    "tgbot_loop_blocked_seconds_total", "Seconds the event loop was stalled, by call site",
+    ["site"], registry=registry
+)
+
+
+def timed_handler(func, name=None):
+    """Wrap an async update handler so its latency and errors are recorded."""
+    name = name or func.__name__
+    histogram = HANDLER_SECONDS.labels(name)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        except Exception:
+            HANDLER_ERRORS.labels(name).inc()
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - start)
+    return wrapper
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo command listener feeding MONGO_SECONDS, labelled by collection and command."""
+
+    def __init__(self):
+        self._collections = {}
+
+    def _key(self, event):
+        return (event.connection_id, event.request_id)
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        self._collections[self._key(event)] = collection if isinstance(collection, str) else ""
+
+    def succeeded(self, event):
+        collection = self._collections.pop(self._key(event), "")
+        MONGO_SECONDS.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._collections.pop(self._key(event), "")
+        MONGO_SECONDS.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+        MONGO_FAILURES.labels(collection, event.command_name).inc()
+
+
+class CacheCollector:
+    """Exports hit/miss counters and sizes of the StatsTTLCaches in cache.py."""
+
+    def __init__(self, caches):
+        self.caches = caches
+
+    def collect(self):
+        hits = CounterMetricFamily("tgbot_cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily("tgbot_cache_misses", "Cache misses", labels=["cache"])
+        size = GaugeMetricFamily("tgbot_cache_size", "Cached entries", labels=["cache"])
+        for cache in self.caches:
+            hits.add_metric([cache.name], cache.hits)
+            misses.add_metric([cache.name], cache.misses)
+            size.add_metric([cache.name], cache.currsize)
+        yield hits
+        yield misses
+        yield size
+
+
+def track_queue(name, queue):
+    QUEUE_DEPTH.labels(name).set_function(queue.qsize)
+
+def render_metrics():
+    """Return (body, content type) in the Prometheus text format."""
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,96 @@
+import gzip
+import json
+import asyncio
+import logging
+from config import TMDB_MOVIE_EXPORT, TMDB_TV_EXPORT
+from tmdb_cache import normalize_title
+
+logger = logging.getLogger(__name__)
+
+# Title field of each TMDB daily ID export
+EXPORT_TITLE_FIELDS = {
+    "movie": ("original_title", "title"),
+    "tv": ("original_name", "name"),
+}
+
+def read_export(path, kind):
+    """
+    Parse a TMDB ID export (JSON lines, optionally gzipped) into
+    {normalized title: [(id, year), ...]} ordered by popularity.
+    `year` is None unless the export carries a release/first-air date or year.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    entries = {}
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                continue
+            if item.get("adult") or item.get("video"):
+                continue
+            if "id" not in item:
+                continue
+            date = item.get("release_date") or item.get("first_air_date") or item.get("year")
+            year = str(date)[:4] if date else None
+            # Index the original and the localized title, when the export has both
+            keys = {normalize_title(item.get(field)) for field in EXPORT_TITLE_FIELDS[kind]}
+            for key in keys - {""}:
+                entries.setdefault(key, []).append((item.get("popularity") or 0, item["id"], year))
+    return {
+        key: [(tmdb_id, year) for _, tmdb_id, year in sorted(matches, key=lambda m: -m[0])]
+        for key, matches in entries.items()
+    }
+
+
+class OfflineMatcher:
+    """
+    Title -> TMDB id lookups against TMDB's daily ID exports, held in memory.
+    Disabled until an export is loaded.
+    """
+
+    def __init__(self):
+        self._titles = {"movie": {}, "tv": {}}
+
+    @property
+    def enabled(self):
+        return any(self._titles.values())
+
+    async def load(self, path, kind):
+        """Load one export file off the event loop. Returns the number of titles indexed."""
+        self._titles[kind] = await asyncio.to_thread(read_export, path, kind)
+        logger.info(f"Offline TMDB {kind} matcher loaded {len(self._titles[kind])} titles from {path}.")
+        return len(self._titles[kind])
+
+    async def load_configured(self):
+        """Load the exports named by TMDB_MOVIE_EXPORT / TMDB_TV_EXPORT, if any."""
+        for kind, path in (("movie", TMDB_MOVIE_EXPORT), ("tv", TMDB_TV_EXPORT)):
+            if not path:
+                continue
+            try:
+                await self.load(path, kind)
+            except (OSError, EOFError) as e:
+                logger.error(f"Could not load TMDB {kind} export {path}: {e}")
+
+    def match(self, title, year=None, kind="movie"):
+        """
+        Return {"id": ..., "media_type": kind} for an exact title match, or None.
+        Without a year the most popular match wins. With a year only an entry
+        dated that year is returned: TMDB's exports carry no dates, so an
+        undated candidate (often a remake or another film sharing the title)
+        is not trusted and the caller falls back to the search API.
+        """
+        matches = self._titles[kind].get(normalize_title(title))
+        if not matches:
+            return None
+        if year:
+            matches = [m for m in matches if m[1] == str(year)]
+            if not matches:
+                return None
+        return {"id": matches[0][0], "media_type": kind}
+
+
+offline_matcher = OfflineMatcher()
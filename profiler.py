@@ -0,0 +1,175 @@
+import io
+import re
+import sys
+import time
+import asyncio
+import logging
+import threading
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+MAX_PROFILE_SECONDS = 300
+SAMPLE_INTERVAL = 0.005
+LAG_PROBE_INTERVAL = 0.1
+SLOW_CALLBACK_SECONDS = 0.05
+
+# asyncio debug-mode warning: "Executing <Handle ...> took 0.123 seconds"
+SLOW_CALLBACK_RE = re.compile(r"Executing (.+) took ([\d.]+) seconds")
+# Coroutine and resume point inside a Task repr: "coro=<busy() running at bot.py:12>"
+TASK_CORO_RE = re.compile(r"coro=<(\S+) running at ([^>\s]+)")
+
+# Only one profile may run at a time
+profile_lock = asyncio.Lock()
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})"
+
+
+class StackSampler(threading.Thread):
+    """
+    Samples one thread's Python stack every `interval` seconds from a side thread.
+    Exists only while a profile runs, so there is no overhead otherwise.
+    """
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class SlowCallbackHandler(logging.Handler):
+    """Collects asyncio's slow-callback warnings while loop debug mode is on."""
+
+    def __init__(self):
+        super().__init__(level=logging.WARNING)
+        self.callbacks = []
+
+    def emit(self, record):
+        match = SLOW_CALLBACK_RE.search(record.getMessage())
+        if match:
+            self.callbacks.append((float(match.group(2)), callback_site(match.group(1))))
+
+
+def callback_site(callback):
+    """Reduce a Handle/Task repr to `coroutine at file:line` so repeats group together."""
+    match = TASK_CORO_RE.search(callback)
+    if match:
+        return f"{match.group(1)} at {match.group(2).rsplit('/', 1)[-1]}"
+    return callback[:200]
+
+
+def rank_slow_callbacks(callbacks):
+    """[(total seconds, count, max seconds, site)] ordered by total time blocked."""
+    grouped = {}
+    for duration, site in callbacks:
+        total, count, longest = grouped.get(site, (0.0, 0, 0.0))
+        grouped[site] = (total + duration, count + 1, max(longest, duration))
+    return sorted(((total, count, longest, site) for site, (total, count, longest) in grouped.items()), reverse=True)
+
+
+async def measure_loop_lag(until, lags, interval=LAG_PROBE_INTERVAL):
+    """Record how late the loop wakes a sleeping task, until `until` (monotonic)."""
+    loop = asyncio.get_running_loop()
+    while loop.time() < until:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(max(loop.time() - start - interval, 0))
+
+
+async def profile_event_loop(seconds):
+    """
+    Profile the running event loop for `seconds`: stack samples of the loop
+    thread, wake-up lag, and callbacks slower than SLOW_CALLBACK_SECONDS.
+    Loop debug mode is only enabled for the duration of the profile.
+    """
+    loop = asyncio.get_running_loop()
+    sampler = StackSampler(threading.get_ident())
+    slow_handler = SlowCallbackHandler()
+    asyncio_logger = logging.getLogger("asyncio")
+    was_debug, old_slow = loop.get_debug(), loop.slow_callback_duration
+    lags = []
+
+    asyncio_logger.addHandler(slow_handler)
+    loop.slow_callback_duration = SLOW_CALLBACK_SECONDS
+    loop.set_debug(True)
+    sampler.start()
+    started = time.monotonic()
+    try:
+        await measure_loop_lag(loop.time() + seconds, lags)
+    finally:
+        sampler.stop()
+        loop.set_debug(was_debug)
+        loop.slow_callback_duration = old_slow
+        asyncio_logger.removeHandler(slow_handler)
+
+    return {
+        "duration": time.monotonic() - started,
+        "samples": sampler.samples,
+        "stacks": sampler.stacks,
+        "lags": lags,
+        "slow_callbacks": rank_slow_callbacks(slow_handler.callbacks),
+    }
+
+
+def rank_functions(stacks):
+    """Return (self counts, inclusive counts) per function from collapsed stacks."""
+    own, total = Counter(), Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        own[frames[-1]] += count
+        for label in set(frames):
+            total[label] += count
+    return own, total
+
+
+def format_profile_report(report, top=20):
+    samples = report["samples"] or 1
+    own, total = rank_functions(report["stacks"])
+    lags = report["lags"]
+
+    text = f"Profile: {report['duration']:.1f}s, {report['samples']} samples\n"
+    if lags:
+        text += (
+            f"Loop lag: avg {sum(lags) / len(lags) * 1000:.1f} ms, "
+            f"max {max(lags) * 1000:.1f} ms over {len(lags)} probes\n"
+        )
+    text += "\nTop functions by own time (self% / total%):\n"
+    for label, count in own.most_common(top):
+        text += f"{count / samples * 100:5.1f}% {total[label] / samples * 100:5.1f}%  {label}\n"
+    text += f"\nSlow callbacks (> {SLOW_CALLBACK_SECONDS * 1000:.0f} ms), by total time blocked:\n"
+    if not report["slow_callbacks"]:
+        text += "none\n"
+    for total_time, count, longest, site in report["slow_callbacks"][:top]:
+        text += f"{total_time * 1000:8.1f} ms  {count}x, max {longest * 1000:.1f} ms  {site}\n"
+    return text
+
+
+def collapsed_stacks(report):
+    """Flamegraph input (flamegraph.pl / speedscope): one `frame;frame;frame count` line per stack."""
+    buffer = io.BytesIO("".join(
+        f"{stack} {count}\n" for stack, count in report["stacks"].most_common()
+    ).encode())
+    buffer.name = "profile.collapsed.txt"
+    return buffer
@@ -0,0 +1,151 @@
+import time
+import heapq
+import asyncio
+import itertools
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+from cachetools import TTLCache
+from config import API_GLOBAL_RATE, API_CHAT_RATE, API_GROUP_RATE, API_CHAT_BURST
+
+# Priority classes: lower values are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+api_priority = contextvars.ContextVar("api_priority", default=PRIORITY_INTERACTIVE)
+
+@contextmanager
+def bulk_priority():
+    """Run the enclosed API calls behind interactive traffic (broadcasts, /copy, restores)."""
+    token = api_priority.set(PRIORITY_BULK)
+    try:
+        yield
+    finally:
+        api_priority.reset(token)
+
+
+class TokenBucket:
+    """
+    Async token bucket. Callers that have to wait are queued by priority,
+    then in arrival order.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._drainer = None
+
+    def _wait_time(self):
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def pause(self, seconds):
+        """Hand out no tokens for `seconds` (e.g. after a FloodWait)."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, priority=PRIORITY_INTERACTIVE):
+        if not self._waiters and self._wait_time() == 0:
+            self.tokens -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        if self._drainer is None or self._drainer.done():
+            self._drainer = asyncio.create_task(self._drain())
+        await future
+
+    async def _drain(self):
+        while self._waiters:
+            delay = self._wait_time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self.tokens -= 1
+            future.set_result(None)
+
+
+class ApiRateLimiter:
+    """
+    Shared scheduler for outgoing Telegram calls: one global bucket plus one
+    bucket per chat, with FloodWait accounting.
+    """
+
+    def __init__(self, global_rate=API_GLOBAL_RATE, chat_rate=API_CHAT_RATE, group_rate=API_GROUP_RATE, chat_burst=API_CHAT_BURST):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.chat_buckets = TTLCache(maxsize=10000, ttl=600)
+        self.calls = Counter()
+        self.flood_waits = Counter()
+        self.flood_wait_seconds = Counter()
+
+    def chat_bucket(self, chat_id):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            # Private chats have positive ids; groups and channels are slower
+            rate = self.chat_rate if chat_id > 0 else self.group_rate
+            bucket = TokenBucket(rate, self.chat_burst)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def acquire(self, chat_id):
+        priority = api_priority.get()
+        await self.chat_bucket(chat_id).acquire(priority)
+        await self.global_bucket.acquire(priority)
+
+    def record_call(self, method):
+        self.calls[method] += 1
+
+    def record_flood_wait(self, method, seconds, chat_id=None):
+        self.flood_waits[method] += 1
+        self.flood_wait_seconds[method] += seconds
+        if chat_id is not None:
+            self.chat_bucket(chat_id).pause(seconds)
+
+    def stats(self):
+        return {
+            "calls": sum(self.calls.values()),
+            "flood_waits": sum(self.flood_waits.values()),
+            "flood_wait_seconds": sum(self.flood_wait_seconds.values()),
+            "by_method": {
+                method: (self.flood_waits[method], self.flood_wait_seconds[method])
+                for method in self.flood_waits
+            },
+        }
+
+
+def outgoing_chat_id(query):
+    """
+    Return the target chat id of a raw query that posts or edits a message,
+    or None for any other query.
+    """
+    method = query.QUALNAME.rsplit(".", 1)[-1]
+    if not method.startswith(("Send", "Forward", "Edit")):
+        return None
+    peer = getattr(query, "to_peer", None) or getattr(query, "peer", None)
+    if peer is None:
+        return None
+    if getattr(peer, "user_id", None):
+        return peer.user_id
+    if getattr(peer, "channel_id", None):
+        return -1000000000000 - peer.channel_id
+    if getattr(peer, "chat_id", None):
+        return -peer.chat_id
+    return None
+
+
+api_limiter = ApiRateLimiter()
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from config import RESTORE_PREFETCH, RESTORE_CHECKPOINT_EVERY
+from db import tmdb_col, jobs_col, iter_batches
+from rate_limiter import bulk_priority
+from utility import safe_api_call, get_tmdb_post, send_tmdb_post
+
+logger = logging.getLogger(__name__)
+
+# Restore jobs running in this process: {job_id: job document}
+running_restore_jobs = {}
+# Their tasks; the loop only keeps weak references to tasks
+restore_job_tasks = set()
+
+def format_restore_job(job):
+    done = job["sent"] + job["skipped"] + job["failed"]
+    return (
+        f"📂 {done}/{job['total']} titles processed (last committed: <code>{job['last_id']}</code>)\n"
+        f"✅ {job['sent']} sent, ⏭️ {job['skipped']} without poster, ❌ {job['failed']} failed"
+    )
+
+async def update_restore_job_status(client, job, header):
+    if not job.get("status_message_id"):
+        return
+    await safe_api_call(client.edit_message_text(
+        job["status_chat_id"],
+        job["status_message_id"],
+        f"{header}\n{format_restore_job(job)}"
+    ))
+
+async def create_restore_job(start_id, status_message):
+    query = {"_id": {"$gt": start_id}} if start_id else {}
+    now = datetime.now(timezone.utc)
+    job = {
+        "type": "restore_tmdb",
+        "status": "running",
+        "last_id": start_id,
+        "total": await tmdb_col.count_documents(query),
+        "sent": 0,
+        "skipped": 0,
+        "failed": 0,
+        "status_chat_id": status_message.chat.id,
+        "status_message_id": status_message.id,
+        "created_at": now,
+        "updated_at": now,
+    }
+    result = await jobs_col.insert_one(job)
+    job["_id"] = result.inserted_id
+    return job
+
+async def get_resumable_restore_job(status_message):
+    """Latest interrupted or failed restore job, re-pointed at a new status message."""
+    job = await jobs_col.find_one(
+        {"type": "restore_tmdb", "status": {"$in": ["running", "failed"]}},
+        sort=[("_id", -1)]
+    )
+    if not job or job["_id"] in running_restore_jobs:
+        return None
+    job["status"] = "running"
+    job["status_chat_id"] = status_message.chat.id
+    job["status_message_id"] = status_message.id
+    await jobs_col.update_one(
+        {"_id": job["_id"]},
+        {"$set": {"status": "running", "status_chat_id": status_message.chat.id, "status_message_id": status_message.id}}
+    )
+    return job
+
+async def checkpoint_restore_job(job, counts):
+    await jobs_col.update_one(
+        {"_id": job["_id"]},
+        {
+            "$set": {"last_id": job["last_id"], "updated_at": datetime.now(timezone.utc)},
+            "$inc": counts
+        }
+    )
+
+async def prefetch_restore_docs(job, prefetched, semaphore):
+    """
+    Stream tmdb_col after the job's checkpoint and prepare each title's post,
+    at most RESTORE_PREFETCH ahead of the sender. Titles with a stored poster
+    file_id need no TMDB request. Ends the stream with None, or with the
+    exception if reading tmdb_col fails, so the sender never waits forever.
+    """
+    async def fetch(doc):
+        async with semaphore:
+            return await get_tmdb_post(doc.get("tmdb_id"), doc.get("tmdb_type"), doc=doc)
+
+    query = {"_id": {"$gt": job["last_id"]}} if job["last_id"] else {}
+    projection = {"_id": 1, "tmdb_id": 1, "tmdb_type": 1, "poster_file_id": 1, "caption": 1, "trailer_url": 1}
+    try:
+        async for doc in iter_batches(tmdb_col, query, projection, batch_size=max(RESTORE_PREFETCH * 4, 100)):
+            await prefetched.put((doc, asyncio.create_task(fetch(doc))))
+    except Exception as e:
+        await prefetched.put(e)
+        return
+    await prefetched.put(None)
+
+async def run_restore_job(client, job):
+    """
+    Re-post every TMDB poster after the job's checkpoint, in _id order.
+    Posts are prepared concurrently ahead of a single sender that runs at bulk
+    priority, so throughput is bound by Telegram's send rate. The checkpoint is
+    the _id of the last title handed to Telegram.
+    """
+    running_restore_jobs[job["_id"]] = job
+    prefetched = asyncio.Queue(maxsize=RESTORE_PREFETCH * 2)
+    producer = asyncio.create_task(
+        prefetch_restore_docs(job, prefetched, asyncio.Semaphore(RESTORE_PREFETCH))
+    )
+    counts = {"sent": 0, "skipped": 0, "failed": 0}
+    try:
+        with bulk_priority():
+            while True:
+                item = await prefetched.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                doc, fetch = item
+                try:
+                    post = await fetch
+                    if post is None:
+                        status = "skipped"
+                    else:
+                        status = "sent" if await send_tmdb_post(client, post) else "failed"
+                except Exception as e:
+                    logger.error(f"Error restoring tmdb_id={doc.get('tmdb_id')}: {e}")
+                    status = "failed"
+                counts[status] += 1
+                job[status] += 1
+                job["last_id"] = doc["_id"]
+
+                if sum(counts.values()) >= RESTORE_CHECKPOINT_EVERY:
+                    await checkpoint_restore_job(job, counts)
+                    counts = {key: 0 for key in counts}
+                    await update_restore_job_status(client, job, "🔁 Restoring TMDB posters...")
+        await producer
+
+        await checkpoint_restore_job(job, counts)
+        job["status"] = "done"
+        await jobs_col.update_one({"_id": job["_id"]}, {"$set": {"status": "done", "updated_at": datetime.now(timezone.utc)}})
+        await update_restore_job_status(client, job, "✅ TMDB restore completed!")
+    except asyncio.CancelledError:
+        # Shutdown: leave the job "running" so `/restore tmdb resume` picks it up
+        raise
+    except Exception as e:
+        logger.error(f"Restore job {job['_id']} failed: {e}")
+        await checkpoint_restore_job(job, counts)
+        job["status"] = "failed"
+        await jobs_col.update_one({"_id": job["_id"]}, {"$set": {"status": "failed", "error": str(e)}})
+        await update_restore_job_status(client, job, f"❌ TMDB restore failed: {e}")
+    finally:
+        producer.cancel()
+        while not prefetched.empty():
+            item = prefetched.get_nowait()
+            if isinstance(item, tuple):
+                item[1].cancel()
+        running_restore_jobs.pop(job["_id"], None)
+
+def start_restore_job(client, job):
+    task = client.loop.create_task(run_restore_job(client, job))
+    restore_job_tasks.add(task)
+    task.add_done_callback(restore_job_tasks.discard)
+    return task
@@ -0,0 +1,130 @@
+import re
+import heapq
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Same tokenizer and filters as the `custom_filename` analyzer in Atlas.txt
+TOKEN_SPLIT = re.compile(r"[\s._\-()\[\]]+")
+
+def tokenize(text):
+    """Split text into lowercase terms exactly like the Atlas `custom_filename` analyzer."""
+    if not text:
+        return []
+    return [term for term in TOKEN_SPLIT.split(text.lower()) if term]
+
+
+class SearchIndex:
+    """
+    In-process inverted index over files_col.
+    Keeps one posting map per channel: {channel_id: {term: {message_id, ...}}}
+    plus the projected file documents needed to render search results.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._postings = {}
+        self._docs = {}
+
+    def add(self, file_info):
+        """Index (or re-index) a single file document."""
+        if not self.enabled or not file_info.get("file_name"):
+            return
+        channel_id = file_info["channel_id"]
+        message_id = file_info["message_id"]
+        key = (channel_id, message_id)
+        if key in self._docs:
+            self.remove(channel_id, message_id)
+        self._docs[key] = {
+            "file_name": file_info["file_name"],
+            "file_size": file_info.get("file_size"),
+            "file_format": file_info.get("file_format"),
+            "message_id": message_id,
+            "channel_id": channel_id,
+        }
+        postings = self._postings.setdefault(channel_id, {})
+        for term in set(tokenize(file_info["file_name"])):
+            postings.setdefault(term, set()).add(message_id)
+
+    def remove(self, channel_id, message_id):
+        """Drop a single file from the index."""
+        if not self.enabled:
+            return
+        doc = self._docs.pop((channel_id, message_id), None)
+        if not doc:
+            return
+        postings = self._postings.get(channel_id, {})
+        for term in set(tokenize(doc["file_name"])):
+            ids = postings.get(term)
+            if ids is None:
+                continue
+            ids.discard(message_id)
+            if not ids:
+                del postings[term]
+
+    def remove_range(self, channel_id, start_id, end_id):
+        """Drop every file of a channel with start_id <= message_id <= end_id."""
+        if not self.enabled:
+            return
+        for cid, mid in [k for k in self._docs if k[0] == channel_id and start_id <= k[1] <= end_id]:
+            self.remove(cid, mid)
+
+    def match(self, query, channel_id):
+        """Return the set of message_ids in a channel containing every query term."""
+        terms = set(tokenize(query))
+        postings = self._postings.get(channel_id)
+        if not terms or not postings:
+            return set()
+        lists = []
+        for term in terms:
+            ids = postings.get(term)
+            if not ids:
+                return set()
+            lists.append(ids)
+        lists.sort(key=len)
+        result = set(lists[0])
+        for ids in lists[1:]:
+            result &= ids
+            if not result:
+                break
+        return result
+
+    @staticmethod
+    def sort_key(doc):
+        """Keyset sort key: file_name, then a stable tiebreak on the message."""
+        return (doc["file_name"], doc["channel_id"], doc["message_id"])
+
+    def count(self, query, channel_ids):
+        return sum(len(self.match(query, channel_id)) for channel_id in channel_ids)
+
+    def search(self, query, channel_ids, limit, after=None, skip=0):
+        """
+        Return up to `limit` files sorted by file_name like the Atlas pipeline.
+        `after` is the sort_key of the last file of the previous page; only files
+        sorting after it are considered, and only the next page is ordered.
+        """
+        keys = []
+        for channel_id in channel_ids:
+            for mid in self.match(query, channel_id):
+                key = self.sort_key(self._docs[(channel_id, mid)])
+                if after is None or key > tuple(after):
+                    keys.append(key)
+        page = heapq.nsmallest(skip + limit, keys)[skip:]
+        return [self._docs[(cid, mid)] for _, cid, mid in page]
+
+    async def load(self, files_col):
+        """Build the index from files_col. Call once at startup."""
+        from db import iter_batches
+        self._postings.clear()
+        self._docs.clear()
+        self.enabled = True
+        projection = {"_id": 1, "channel_id": 1, "message_id": 1, "file_name": 1, "file_size": 1, "file_format": 1}
+        count = 0
+        async for doc in iter_batches(files_col, projection=projection):
+            self.add(doc)
+            count += 1
+        logger.info(f"Local search index built with {count} files.")
+        return count
+
+
+search_index = SearchIndex()
@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# config.py reads these at import time
+os.environ.setdefault("API_ID", "1")
+os.environ.setdefault("OWNER_ID", "1")
+os.environ.setdefault("LOG_CHANNEL_ID", "1")
+os.environ.setdefault("LOG_FILE", os.path.join(tempfile.gettempdir(), "tgsearchbot_test_log.txt"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,67 @@
+import asyncio
+import pytest
+from pyrogram.errors import FloodWait
+import indexer
+
+
+class StubClient:
+    """Raises `floods` FloodWaits from invoke, then returns a raw result."""
+
+    def __init__(self, floods=0, errors=0):
+        self.floods = floods
+        self.errors = errors
+        self.invoke_kwargs = []
+
+    async def resolve_peer(self, chat_id):
+        return chat_id
+
+    async def invoke(self, query, **kwargs):
+        self.invoke_kwargs.append(kwargs)
+        if self.floods:
+            self.floods -= 1
+            raise FloodWait(value=3)
+        if self.errors:
+            self.errors -= 1
+            raise ConnectionError("network blip")
+        return "raw messages"
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+
+    async def fake_parse_messages(client, r):
+        return [r]
+
+    monkeypatch.setattr(indexer.asyncio, "sleep", fake_sleep)
+    monkeypatch.setattr(indexer.utils, "parse_messages", fake_parse_messages)
+    return slept
+
+
+def test_flood_wait_reaches_the_indexer_and_slows_pacing(sleeps):
+    client = StubClient(floods=2)
+    pacing = {"delay": 0}
+    messages = asyncio.run(indexer.fetch_message_batch(client, -100, [1, 2, 3], pacing))
+
+    assert messages == ["raw messages"]
+    assert sleeps == [3, 3]
+    # 0 -> 1 -> 2 on the FloodWaits, halved by the clean batch
+    assert pacing["delay"] == 1
+    assert all(kw == {"sleep_threshold": 0, "flood_retries": 0} for kw in client.invoke_kwargs)
+
+
+def test_clean_batches_speed_pacing_back_up(sleeps):
+    pacing = {"delay": 4}
+    asyncio.run(indexer.fetch_message_batch(StubClient(), -100, [1], pacing))
+    assert pacing["delay"] == 2
+
+
+def test_errors_are_retried_then_raised(sleeps):
+    pacing = {"delay": 0}
+    with pytest.raises(ConnectionError):
+        asyncio.run(indexer.fetch_message_batch(StubClient(errors=5), -100, [1], pacing, retries=3))
+    assert sleeps == [2, 4]
+    assert asyncio.run(indexer.fetch_message_batch(StubClient(errors=2), -100, [1], pacing, retries=3)) == ["raw messages"]
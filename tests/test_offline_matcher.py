@@ -0,0 +1,40 @@
+import os
+import asyncio
+import pytest
+from offline_matcher import OfflineMatcher
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "movie_ids.json")
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    matcher = OfflineMatcher()
+    asyncio.run(matcher.load(FIXTURE, "movie"))
+    return matcher
+
+
+def test_most_popular_title_wins_without_year(matcher):
+    assert matcher.match("The Lion King") == {"id": 420818, "media_type": "movie"}
+
+
+def test_title_is_normalized(matcher):
+    assert matcher.match("the.lion  king!")["id"] == 420818
+
+
+def test_undated_candidates_are_not_trusted_with_a_year(matcher):
+    # The export has no dates: the 2019 remake must not answer for 1994,
+    # and "Parasite" must not answer for Bong's film (listed as 기생충)
+    assert matcher.match("The Lion King", 1994) is None
+    assert matcher.match("Parasite", 2019) is None
+
+
+def test_dated_entries_filter_by_year(matcher):
+    assert matcher.match("The Matrix", 1999) == {"id": 603, "media_type": "movie"}
+    assert matcher.match("Matrix", "1999")["id"] == 603
+    assert matcher.match("The Matrix", 2021) is None
+
+
+def test_adult_entries_and_unknown_titles_are_skipped(matcher):
+    assert matcher.match("Pulp Fiction")["id"] == 680
+    assert matcher.match("Not In The Export") is None
+    assert matcher.match("Pulp Fiction", kind="tv") is None
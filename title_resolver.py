@@ -0,0 +1,85 @@
+import asyncio
+import logging
+from collections import Counter
+from cachetools import TTLCache
+from config import TMDB_MISS_TTL, TMDB_RESOLVE_CONCURRENCY
+from tmdb import get_movie_id, get_tv_id
+from tmdb_cache import normalize_title
+from offline_matcher import offline_matcher
+
+logger = logging.getLogger(__name__)
+
+
+class TitleResolver:
+    """
+    Resolves parsed (title, year, kind) tuples to TMDB ids.
+    Concurrent lookups of the same title share one search (single-flight),
+    titles TMDB does not know are remembered for TMDB_MISS_TTL, and at most
+    TMDB_RESOLVE_CONCURRENCY searches run at once. When an offline export is
+    loaded it is consulted first and the search API is only a fallback.
+    """
+
+    def __init__(self, concurrency=TMDB_RESOLVE_CONCURRENCY, miss_ttl=TMDB_MISS_TTL):
+        self._inflight = {}
+        self._misses = TTLCache(maxsize=10000, ttl=miss_ttl)
+        self._semaphore = asyncio.Semaphore(max(concurrency, 1))
+        self.stats = Counter()
+
+    @staticmethod
+    def key(title, year=None, kind="movie"):
+        return (kind, normalize_title(title), str(year or ""))
+
+    async def resolve(self, title, year=None, kind="movie"):
+        """
+        Return {"id": ..., "media_type": ...} or None if TMDB has no match.
+        Search errors are raised to the caller that ran the search and are not
+        remembered as misses; callers sharing that search get None.
+        """
+        key = self.key(title, year, kind)
+        if not key[1]:
+            return None
+        if key in self._misses:
+            self.stats["negative_hits"] += 1
+            return None
+        if offline_matcher.enabled:
+            local = offline_matcher.match(title, year, kind)
+            if local is not None:
+                self.stats["offline"] += 1
+                return local
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.stats["shared"] += 1
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        result = None
+        try:
+            async with self._semaphore:
+                self.stats["lookups"] += 1
+                search = get_tv_id if kind == "tv" else get_movie_id
+                result = await search(title, year)
+            if result is None:
+                self._misses[key] = True
+            return result
+        finally:
+            self._inflight.pop(key, None)
+            future.set_result(result)
+
+    async def resolve_many(self, titles):
+        """
+        Resolve an iterable of (title, year, kind) tuples concurrently, one lookup
+        per distinct title. Returns {(title, year, kind): result or None}.
+        """
+        distinct = list(dict.fromkeys(titles))
+        results = await asyncio.gather(
+            *(self.resolve(title, year, kind) for title, year, kind in distinct),
+            return_exceptions=True
+        )
+        return {
+            title: None if isinstance(result, Exception) else result
+            for title, result in zip(distinct, results)
+        }
+
+
+title_resolver = TitleResolver()
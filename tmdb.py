@@ -1,26 +1,31 @@
 import re
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import aiohttp
 from imdb import Cinemagoer
-from config import TMDB_API_KEY, logger
+from config import TMDB_API_KEY, TMDB_POSTER_SIZE, IMDB_TIMEOUT, IMDB_WORKERS, logger
+from http_client import http
+from tmdb_cache import tmdb_cache, normalize_title
 
-POSTER_BASE_URL = 'https://image.tmdb.org/t/p/original'
+TMDB_API_URL = 'https://api.themoviedb.org/3'
+POSTER_BASE_URL = f'https://image.tmdb.org/t/p/{TMDB_POSTER_SIZE}'
 
-def get_cast_and_crew(tmdb_type, movie_id):
+# Cinemagoer blocks; a timed-out scrape keeps its thread, so scrapes get their own small pool
+imdb_executor = ThreadPoolExecutor(max_workers=max(IMDB_WORKERS, 1), thread_name_prefix="imdb")
+
+def extract_cast_and_crew(data):
     """
-    Fetches the cast and crew details (starring actors and director) for a movie or TV show.
+    Starring actors and director from the appended `credits` of a detail payload.
     """
-    import requests
-    cast_crew_url = f'https://api.themoviedb.org/3/{tmdb_type}/{movie_id}/credits?api_key={TMDB_API_KEY}&language=en-US'
-    response = requests.get(cast_crew_url)
-    cast_crew_data = response.json()
-
-    starring = [member['name'] for member in cast_crew_data.get('cast', [])[:5]]
-    director = next((member['name'] for member in cast_crew_data.get('crew', []) if member['job'] == 'Director'), "")
+    credits = data.get('credits') or {}
+    starring = [member['name'] for member in credits.get('cast', [])[:5]]
+    director = next((member['name'] for member in credits.get('crew', []) if member.get('job') == 'Director'), "")
     return {"starring": starring, "director": director}
 
 def get_imdb_details(imdb_id):
     try:
-        ia = Cinemagoer()
+        # Socket timeout, so a stalled scrape ends and frees its imdb_executor thread
+        ia = Cinemagoer(timeout=max(int(IMDB_TIMEOUT), 1))
         movie = ia.get_movie(imdb_id.replace('tt', ''))
         if not movie:
             return {}
@@ -32,13 +37,89 @@ def get_imdb_details(imdb_id):
         logger.error(f"IMDbPY error: {e}")
         return {}
 
-def format_tmdb_info(tmdb_type, movie_id, data):
-    cast_crew = get_cast_and_crew(tmdb_type, movie_id)
+async def fetch_imdb_details(imdb_id):
+    """
+    Cinemagoer scrapes synchronously, so run it on imdb_executor with a timeout.
+    Successful lookups are cached; returns {} when there is no id, on error or on timeout.
+    """
+    if not imdb_id:
+        return {}
+    cached = await tmdb_cache.get("imdb", imdb_id)
+    if cached is not None:
+        return cached
+    try:
+        loop = asyncio.get_running_loop()
+        info = await asyncio.wait_for(loop.run_in_executor(imdb_executor, get_imdb_details, imdb_id), IMDB_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning(f"IMDb lookup for {imdb_id} timed out after {IMDB_TIMEOUT}s")
+        return {}
+    if info:
+        await tmdb_cache.set("imdb", imdb_id, info)
+    return info
 
+async def fetch_tmdb_details(tmdb_type, tmdb_id):
+    """
+    Details, credits, images, videos and external ids in a single TMDB request.
+    """
+    return await http.get_json(
+        f"{TMDB_API_URL}/{tmdb_type}/{tmdb_id}",
+        {
+            "api_key": TMDB_API_KEY,
+            "language": "en-US",
+            "append_to_response": "credits,images,videos,external_ids",
+            "include_image_language": "en,hi",
+            "include_video_language": "en,hi",
+        }
+    )
+
+def compact_details(data):
+    """
+    Trim a detail payload to the parts get_info uses before it is cached:
+    top cast, directors, the first backdrop/poster and YouTube trailers.
+    """
+    credits = data.get('credits') or {}
+    images = data.get('images') or {}
+    videos = data.get('videos') or {}
+    return {
+        **data,
+        "credits": {
+            "cast": credits.get('cast', [])[:5],
+            "crew": [member for member in credits.get('crew', []) if member.get('job') == 'Director'],
+        },
+        "images": {
+            "backdrops": images.get('backdrops', [])[:1],
+            "posters": images.get('posters', [])[:1],
+        },
+        "videos": {
+            "results": [
+                video for video in videos.get('results', [])
+                if video.get('site') == 'YouTube' and video.get('type') == 'Trailer'
+            ][:1]
+        },
+    }
+
+async def get_tmdb_details(tmdb_type, tmdb_id):
+    """Cached fetch_tmdb_details. Raises ValueError when TMDB has no such title."""
+    key = f"{tmdb_type}:{tmdb_id}"
+    data = await tmdb_cache.get("details", key)
+    if data is not None:
+        return data
+    data = await fetch_tmdb_details(tmdb_type, tmdb_id)
+    if not data or 'id' not in data:
+        raise ValueError(data.get('status_message', 'not found') if data else 'empty response')
+    data = compact_details(data)
+    await tmdb_cache.set("details", key, data)
+    return data
+
+def get_imdb_id(tmdb_type, data):
     if tmdb_type == 'movie':
-        imdb_id = data.get('imdb_id')
-        imdb_info = get_imdb_details(imdb_id) if imdb_id else {}
+        return data.get('imdb_id')
+    return (data.get('external_ids') or {}).get('imdb_id')
+
+def format_tmdb_info(tmdb_type, data, imdb_info):
+    cast_crew = extract_cast_and_crew(data)
 
+    if tmdb_type == 'movie':
         title = data.get('title')
         genre = extract_genres(data)
         genre_tags = " ".join([genre_tag_with_emoji(g) for g in genre])
@@ -70,9 +151,6 @@ def format_tmdb_info(tmdb_type, movie_id, data):
         return message.strip()
 
     elif tmdb_type == 'tv':
-        imdb_id = get_tv_imdb_id_sync(movie_id)
-        imdb_info = get_imdb_details(imdb_id) if imdb_id else {}
-
         title = data.get('name')
         genre = extract_genres(data)
         genre_tags = " ".join([genre_tag_with_emoji(g) for g in genre])
@@ -105,44 +183,49 @@ def format_tmdb_info(tmdb_type, movie_id, data):
     else:
         return "Unknown type. Unable to format information."
 
-def get_tv_imdb_id_sync(tv_id):
-    import requests
-    url = f"https://api.themoviedb.org/3/tv/{tv_id}/external_ids?api_key={TMDB_API_KEY}"
-    resp = requests.get(url)
-    data = resp.json()
-    return data.get("imdb_id")
+def select_poster_path(data):
+    images = data.get('images') or {}
+    if images.get('backdrops'):
+        return images['backdrops'][0]['file_path']
+    if images.get('posters'):
+        return images['posters'][0]['file_path']
+    return data.get('poster_path')
+
+def select_trailer_url(data):
+    for video in (data.get('videos') or {}).get('results', []):
+        if video.get('site') == 'YouTube' and video.get('type') == 'Trailer':
+            return f"https://www.youtube.com/watch?v={video['key']}"
+    return None
 
 async def get_info(tmdb_type, tmdb_id):
-    api_url = f"https://api.themoviedb.org/3/{tmdb_type}/{tmdb_id}?api_key={TMDB_API_KEY}&language=en-US"
-    image_url = f'https://api.themoviedb.org/3/{tmdb_type}/{tmdb_id}/images?api_key={TMDB_API_KEY}&language=en-US&include_image_language=en,hi'
+    """
+    Fetch everything needed for a poster post with one (cached) TMDB request plus
+    an off-loop IMDb lookup.
+    Returns a dict with tmdb_id, tmdb_type, title, year, imdb_id, rating,
+    message (HTML caption), poster_url and trailer_url.
+    """
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(api_url) as detail_response:
-                data = await detail_response.json()
-                async with session.get(image_url) as movie_response:
-                    images = await movie_response.json()
-                message = format_tmdb_info(tmdb_type, tmdb_id, data)
-
-                poster_path = data.get('poster_path', None)
-                if 'backdrops' in images and images['backdrops']:
-                    poster_path = images['backdrops'][0]['file_path']
-                elif 'posters' in images and images['posters']:
-                    poster_path = images['posters'][0]['file_path']
-                poster_url = f"https://image.tmdb.org/t/p/original{poster_path}" if poster_path else None
+        data = await get_tmdb_details(tmdb_type, tmdb_id)
 
-                video_url = f'https://api.themoviedb.org/3/{tmdb_type}/{tmdb_id}/videos?api_key={TMDB_API_KEY}'
-                async with session.get(video_url) as video_response:
-                    video_data = await video_response.json()
-                    trailer_url = None
-                    for video in video_data.get('results', []):
-                        if video['site'] == 'YouTube' and video['type'] == 'Trailer':
-                            trailer_url = f"https://www.youtube.com/watch?v={video['key']}"
-                            break
+        imdb_id = get_imdb_id(tmdb_type, data)
+        imdb_info = await fetch_imdb_details(imdb_id) if tmdb_type in ('movie', 'tv') else {}
 
-                return {"message": message, "poster_url": poster_url, "trailer_url": trailer_url}
-    except aiohttp.ClientError as e:
+        poster_path = select_poster_path(data)
+        release_date = data.get('release_date') or data.get('first_air_date') or ""
+        return {
+            "tmdb_id": tmdb_id,
+            "tmdb_type": tmdb_type,
+            "title": data.get('title') or data.get('name'),
+            "year": release_date[:4] or None,
+            "imdb_id": imdb_id,
+            "rating": imdb_info.get('rating'),
+            "message": format_tmdb_info(tmdb_type, data, imdb_info),
+            "poster_url": f"{POSTER_BASE_URL}{poster_path}" if poster_path else None,
+            "trailer_url": select_trailer_url(data),
+        }
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
         logger.error(f"Error fetching TMDB data: {e}")
-    return {"message": f"Error: {str(e)}", "poster_url": None}
+        return {"message": f"Error: {str(e)}", "poster_url": None, "trailer_url": None}
 
 def truncate_overview(overview):
     """
@@ -160,54 +243,64 @@ def truncate_overview(overview):
     return overview
 
 async def get_movie_id(movie_name, release_year=None):
-    tmdb_search_url = f'https://api.themoviedb.org/3/search/movie?api_key={TMDB_API_KEY}&query={movie_name}'
+    cache_key = f"movie|{normalize_title(movie_name)}|{release_year or ''}"
+    cached = await tmdb_cache.get("search", cache_key)
+    if cached is not None:
+        return cached
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(tmdb_search_url) as search_response:
-                search_data = await search_response.json()
-                if search_data.get('results'):
-                    results = search_data['results']
-                    if release_year:
-                        # Filter by release year if provided
-                        results = [
-                            result for result in results
-                            if 'release_date' in result and result['release_date'] and result['release_date'][:4] == str(release_year)
-                        ]
-                    if results:
-                        result = results[0]
-                        return {
-                            "id": result['id'],
-                            "media_type": "movie"
-                        }
+        search_data = await http.get_json(
+            f"{TMDB_API_URL}/search/movie",
+            {"api_key": TMDB_API_KEY, "query": movie_name}
+        )
+        if search_data.get('results'):
+            results = search_data['results']
+            if release_year:
+                # Filter by release year if provided
+                results = [
+                    result for result in results
+                    if 'release_date' in result and result['release_date'] and result['release_date'][:4] == str(release_year)
+                ]
+            if results:
+                result = {
+                    "id": results[0]['id'],
+                    "media_type": "movie"
+                }
+                await tmdb_cache.set("search", cache_key, result)
+                return result
         return None
     except Exception as e:
         logger.error(f"Error fetching TMDb movie by name: {e}")
-        return
+        raise
 
 async def get_tv_id(tv_name, first_air_year=None):
-    tmdb_search_url = f'https://api.themoviedb.org/3/search/tv?api_key={TMDB_API_KEY}&query={tv_name}'
+    cache_key = f"tv|{normalize_title(tv_name)}|{first_air_year or ''}"
+    cached = await tmdb_cache.get("search", cache_key)
+    if cached is not None:
+        return cached
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(tmdb_search_url) as search_response:
-                search_data = await search_response.json()
-                if search_data.get('results'):
-                    results = search_data['results']
-                    if first_air_year:
-                        # Filter by first air year if provided
-                        results = [
-                            result for result in results
-                            if 'first_air_date' in result and result['first_air_date'] and result['first_air_date'][:4] == str(first_air_year)
-                        ]
-                    if results:
-                        result = results[0]
-                        return {
-                            "id": result['id'],
-                            "media_type": "tv"
-                        }
+        search_data = await http.get_json(
+            f"{TMDB_API_URL}/search/tv",
+            {"api_key": TMDB_API_KEY, "query": tv_name}
+        )
+        if search_data.get('results'):
+            results = search_data['results']
+            if first_air_year:
+                # Filter by first air year if provided
+                results = [
+                    result for result in results
+                    if 'first_air_date' in result and result['first_air_date'] and result['first_air_date'][:4] == str(first_air_year)
+                ]
+            if results:
+                result = {
+                    "id": results[0]['id'],
+                    "media_type": "tv"
+                }
+                await tmdb_cache.set("search", cache_key, result)
+                return result
         return None
     except Exception as e:
         logger.error(f"Error fetching TMDb TV by name: {e}")
-        return
+        raise
     
 GENRE_EMOJI_MAP = {
     "Action": "🥊", "Adventure": "🌋", "Animation": "🎬", "Comedy": "😂",
@@ -248,10 +341,3 @@ def format_duration(duration):
         return f"{hours}h {mins:02d}min" if hours else f"{mins}min"
     except Exception:
         return duration or ""
-    
-async def get_tv_imdb_id(tv_id):
-    url = f"https://api.themoviedb.org/3/tv/{tv_id}/external_ids?api_key={TMDB_API_KEY}"
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as resp:
-            data = await resp.json()
-            return data.get("imdb_id")
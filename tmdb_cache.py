@@ -0,0 +1,91 @@
+import re
+import time
+import logging
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from cachetools import TLRUCache
+from pymongo.errors import PyMongoError
+from config import TMDB_CACHE_SIZE, TMDB_SEARCH_TTL, TMDB_DETAILS_TTL, IMDB_CACHE_TTL
+from db import api_cache_col
+
+logger = logging.getLogger(__name__)
+
+# Namespace -> TTL in seconds
+NAMESPACE_TTLS = {
+    "search": TMDB_SEARCH_TTL,
+    "details": TMDB_DETAILS_TTL,
+    "imdb": IMDB_CACHE_TTL,
+}
+
+def normalize_title(title):
+    """Lowercase, strip punctuation and collapse whitespace so near-identical titles share a key."""
+    return " ".join(re.sub(r"[^\w\s]", " ", (title or "").lower()).split())
+
+
+class TmdbCache:
+    """
+    Two-tier cache for TMDB/IMDb responses: a TLRUCache per namespace in memory,
+    backed by api_cache_col so entries survive restarts. Mongo drops expired
+    documents through the `expires_at` TTL index.
+    """
+
+    def __init__(self, maxsize=TMDB_CACHE_SIZE, ttls=NAMESPACE_TTLS):
+        self.ttls = ttls
+        # Entries are (value, monotonic deadline), so a Mongo hit keeps its remaining lifetime
+        self.memory = {ns: TLRUCache(maxsize=maxsize, ttu=lambda _key, entry, _now: entry[1]) for ns in ttls}
+        self.hits = Counter()
+        self.misses = Counter()
+
+    @staticmethod
+    def _doc_id(namespace, key):
+        return f"{namespace}:{key}"
+
+    async def get(self, namespace, key):
+        """Return the cached value, or None on a miss in both tiers."""
+        memory = self.memory[namespace]
+        entry = memory.get(key)
+        if entry is not None:
+            self.hits[(namespace, "memory")] += 1
+            return entry[0]
+        try:
+            doc = await api_cache_col.find_one({
+                "_id": self._doc_id(namespace, key),
+                "expires_at": {"$gt": datetime.now(timezone.utc)}
+            })
+        except PyMongoError as e:
+            logger.error(f"Error reading {namespace} cache: {e}")
+            doc = None
+        if doc is None:
+            self.misses[namespace] += 1
+            return None
+        self.hits[(namespace, "mongo")] += 1
+        expires_at = doc["expires_at"]
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        remaining = (expires_at - datetime.now(timezone.utc)).total_seconds()
+        memory[key] = (doc["value"], time.monotonic() + min(self.ttls[namespace], remaining))
+        return doc["value"]
+
+    async def set(self, namespace, key, value):
+        self.memory[namespace][key] = (value, time.monotonic() + self.ttls[namespace])
+        try:
+            await api_cache_col.update_one(
+                {"_id": self._doc_id(namespace, key)},
+                {"$set": {
+                    "value": value,
+                    "expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.ttls[namespace])
+                }},
+                upsert=True
+            )
+        except PyMongoError as e:
+            logger.error(f"Error writing {namespace} cache: {e}")
+
+    def stats(self):
+        """{namespace: (memory hits, mongo hits, misses)}"""
+        return {
+            ns: (self.hits[(ns, "memory")], self.hits[(ns, "mongo")], self.misses[ns])
+            for ns in self.ttls
+        }
+
+
+tmdb_cache = TmdbCache()
@@ -1,6 +1,5 @@
 
 import re
-import aiohttp
 import asyncio
 import base64
 import uuid
@@ -9,8 +8,14 @@ import PTN
 import os
 import logging
 from datetime import datetime, timezone, timedelta
-from pyrogram.errors import FloodWait, UserNotParticipant, UserIsBlocked, InputUserDeactivated, PeerIdInvalid, UserIsBot
+from pyrogram.errors import (
+    FloodWait, UserNotParticipant, UserIsBlocked, InputUserDeactivated, PeerIdInvalid, UserIsBot,
+    FileReferenceExpired, FileReferenceInvalid, FileIdInvalid, MediaEmpty, MediaInvalid,
+    PhotoInvalid, PhotoInvalidDimensions
+)
 from pyrogram import enums
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, User
 from db import (
     allowed_channels_col,
@@ -21,7 +26,12 @@ from db import (
     tmdb_col
 )
 from config import *
-from tmdb import get_movie_id, get_tv_id, get_info
+from tmdb import get_info
+from title_resolver import title_resolver
+from search_index import search_index
+from http_client import http
+from metrics import STAGE_SECONDS, track_queue
+from cache import search_cache, search_api_cache, search_cursor_cache, search_count_cache
 from mutagen.mp3 import MP3
 from mutagen.flac import FLAC
 from mutagen.mp4 import MP4
@@ -35,44 +45,73 @@ from mutagen import File as MutagenFile
 TOKEN_VALIDITY_SECONDS = 24 * 60 * 60  # 24 hours
 AUTO_DELETE_SECONDS = 2 * 60
 
-# Simple in-memory cache: {(q, channel_id): (timestamp, results)}
-search_api_cache = {}
-CACHE_TTL = 300  # 5 minutes
+# Telegram's answers to a stored photo file_id it no longer accepts
+REJECTED_FILE_ID_ERRORS = (
+    FileReferenceExpired, FileReferenceInvalid, FileIdInvalid,
+    MediaEmpty, MediaInvalid, PhotoInvalid, PhotoInvalidDimensions
+)
 
 logger = logging.getLogger(__name__)
 
-def get_cache_key(q, channel_id):
-    return (q.strip().lower(), channel_id)
+# =========================
+# Search Result Cache
+# =========================
 
-# CACHE FOR SEARCH RESULTS
-search_cache = {}
-SEARCH_CACHE_TTL = 300  # seconds (5 minutes)
+# Per-channel generation counter, bumped whenever a channel's files change.
+# Cache keys embed the generation, so stale pages are never served and simply age out.
+search_generation = {}
+
+def search_version(channel_id):
+    """Opaque version of a channel's search results; changes whenever they may have changed."""
+    return f"{search_generation.get(None, 0)}.{search_generation.get(channel_id, 0)}"
+
+def get_cache_key(q, channel_id):
+    return (q.strip().lower(), channel_id, search_version(channel_id))
 
 def make_search_cache_key(query, page, channel_id=None):
-    return (query.lower(), page, channel_id)
+    return get_cache_key(query, channel_id) + (page,)
 
 def get_cached_search(query, page, channel_id=None):
-    key = make_search_cache_key(query, page, channel_id)
-    entry = search_cache.get(key)
-    if entry and (time.time() - entry['time'] < SEARCH_CACHE_TTL):
-        return entry['files'], entry['total_files']
+    entry = search_cache.get(make_search_cache_key(query, page, channel_id))
     if entry:
-        del search_cache[key]
+        return entry
     return None, None
 
-def set_cached_search(query, page, channel_id, files, total_files):
-    key = make_search_cache_key(query, page, channel_id)
-    search_cache[key] = {
-        'files': files,
-        'total_files': total_files,
-        'time': time.time()
-    }
+def set_cached_search(query, page, channel_id, files, has_more):
+    search_cache[make_search_cache_key(query, page, channel_id)] = (files, has_more)
 
-def invalidate_search_cache():
-    search_cache.clear()
-    search_api_cache.clear()
+def invalidate_search_cache(channel_id=None):
+    """
+    Invalidate cached search results for one channel.
+    Without a channel_id everything is dropped.
+    """
+    if channel_id is None:
+        # Keep the counters monotonic (they also version /search ETags); bump a global epoch instead
+        search_generation[None] = search_generation.get(None, 0) + 1
+        search_cache.clear()
+        search_count_cache.clear()
+        search_api_cache.clear()
+        return
+    search_generation[channel_id] = search_generation.get(channel_id, 0) + 1
+
+# Debounced invalidations waiting to fire: {channel_id: asyncio.TimerHandle}
+pending_invalidations = {}
+
+def _fire_search_invalidation(channel_id):
+    pending_invalidations.pop(channel_id, None)
+    invalidate_search_cache(channel_id)
+
+def schedule_search_invalidation(channel_id, delay=SEARCH_INVALIDATE_DELAY):
+    """
+    Invalidate a channel's cached results at most once per `delay` seconds.
+    Results are guaranteed fresh within `delay` seconds of the write.
+    """
+    if channel_id in pending_invalidations:
+        return
+    loop = asyncio.get_running_loop()
+    pending_invalidations[channel_id] = loop.call_later(delay, _fire_search_invalidation, channel_id)
 
-def build_search_pipeline(query, allowed_ids, skip, limit):
+def build_search_compound(query, allowed_ids):
     # Split the query string into words
     terms = query.strip().lower().split()
 
@@ -87,24 +126,36 @@ def build_search_pipeline(query, allowed_ids, skip, limit):
         for term in terms
     ]
 
-    # Build search stage with compound.must
-    search_stage = {
-        "$search": {
-            "index": "default",
-            "compound": {
-                "must": must_clauses
+    # Filter allowed channel IDs inside $search so limits apply to matching docs only
+    filter_clauses = [
+        {
+            "in": {
+                "path": "channel_id",
+                "value": allowed_ids
             }
         }
-    }
+    ]
 
-    # Match allowed channel IDs
-    match_stage = {
-        "$match": {
-            "channel_id": {"$in": allowed_ids}
+    return {"must": must_clauses, "filter": filter_clauses}
+
+def build_search_pipeline(query, allowed_ids, limit, search_after=None, skip=0):
+    """
+    Build a keyset-paginated Atlas pipeline sorted by file_name, channel_id, message_id.
+    Pass the previous page's last `cursor` as search_after; skip is only a fallback
+    for pages whose cursor has expired.
+    """
+    search_stage = {
+        "$search": {
+            "index": "default",
+            "compound": build_search_compound(query, allowed_ids),
+            # Same unique order as SearchIndex.sort_key, so searchAfter never skips or repeats same-named files
+            "sort": {"file_name": 1, "channel_id": 1, "message_id": 1}
         }
     }
+    if search_after:
+        search_stage["$search"]["searchAfter"] = search_after
 
-    # Project only necessary fields and search score
+    # Project only necessary fields and the continuation token
     project_stage = {
         "$project": {
             "_id": 0,
@@ -113,34 +164,101 @@ def build_search_pipeline(query, allowed_ids, skip, limit):
             "file_format": 1,
             "message_id": 1,
             "channel_id": 1,
-            "score": {"$meta": "searchScore"}
+            "cursor": {"$meta": "searchSequenceToken"}
         }
     }
 
-    # Sort results by score and then file name
-    sort_stage = {
-        "$sort": {
-            "file_name": 1,
-            "score": -1
-        }
-    }
+    pipeline = [search_stage]
+    if skip:
+        pipeline.append({"$skip": skip})
+    pipeline += [{"$limit": limit}, project_stage]
+    return pipeline
 
-    # Facet: paginated results and total count
-    facet_stage = {
-        "$facet": {
-            "results": [
-                project_stage,
-                sort_stage,
-                {"$skip": skip},
-                {"$limit": limit}
-            ],
-            "totalCount": [
-                {"$count": "total"}
-            ]
+def build_search_meta_pipeline(query, allowed_ids, count):
+    return [
+        {
+            "$searchMeta": {
+                "index": "default",
+                "compound": build_search_compound(query, allowed_ids),
+                "count": count
+            }
         }
-    }
+    ]
 
-    return [search_stage, match_stage, facet_stage]
+def build_search_count_pipeline(query, allowed_ids):
+    # lowerBound counts exactly up to the threshold and approximately past it
+    if SEARCH_COUNT_THRESHOLD > 0:
+        count = {"type": "lowerBound", "threshold": SEARCH_COUNT_THRESHOLD}
+    else:
+        count = {"type": "total"}
+    return build_search_meta_pipeline(query, allowed_ids, count)
+
+async def count_search_results(query, channel_id):
+    """
+    Count matches for a (query, channel) once and reuse it for every page.
+    Returns (total_files, approximate). Only an Atlas lowerBound count that
+    reached SEARCH_COUNT_THRESHOLD is approximate (shown as "N+").
+    """
+    key = get_cache_key(query, channel_id)
+    cached = search_count_cache.get(key)
+    if cached is not None:
+        return cached
+
+    approximate = False
+    if SEARCH_BACKEND == "local":
+        total_files = search_index.count(query, [channel_id])
+    else:
+        cursor = await files_col.aggregate(build_search_count_pipeline(query, [channel_id]))
+        result = await cursor.to_list()
+        count = result[0]["count"] if result else {}
+        if "total" in count:
+            total_files = count["total"]
+        else:
+            total_files = count.get("lowerBound", 0)
+            approximate = SEARCH_COUNT_THRESHOLD > 0 and total_files >= SEARCH_COUNT_THRESHOLD
+
+    search_count_cache[key] = (total_files, approximate)
+    return total_files, approximate
+
+def search_cursor(file_doc):
+    """Continuation cursor that resumes a search right after file_doc."""
+    if SEARCH_BACKEND == "local":
+        return search_index.sort_key(file_doc)
+    return file_doc["cursor"]
+
+async def search_files(query, allowed_ids, limit, search_after=None, skip=0):
+    """Fetch one page of results from the configured backend."""
+    if SEARCH_BACKEND == "local":
+        return search_index.search(query, allowed_ids, limit, search_after, skip)
+
+    pipeline = build_search_pipeline(query, allowed_ids, limit, search_after, skip)
+    cursor = await files_col.aggregate(pipeline)
+    return await cursor.to_list()
+
+async def search_channel(query, channel_id, page, page_size):
+    """
+    Return (files, total_files, total_is_approximate, has_more) for one page of a channel search.
+    Pages are served from search_cache; otherwise the page resumes from the cursor
+    stored when the previous page was fetched, so deep pages cost the same as page 1.
+    The total comes from the per-query count cache and is computed only once.
+    """
+    # Pages of different sizes (bot vs. /search API) are cached separately
+    page_key = (page, page_size)
+    files, has_more = get_cached_search(query, page_key, channel_id)
+    if files is None:
+        search_after = search_cursor_cache.get(make_search_cache_key(query, page_key, channel_id))
+        skip = 0 if search_after or page == 1 else (page - 1) * page_size
+        # Fetch one extra file to know whether a next page exists without counting
+        files = await search_files(query, [channel_id], page_size + 1, search_after, skip)
+        has_more = len(files) > page_size
+        files = files[:page_size]
+
+        if has_more:
+            search_cursor_cache[make_search_cache_key(query, (page + 1, page_size), channel_id)] = search_cursor(files[-1])
+        set_cached_search(query, page_key, channel_id, files, has_more)
+
+    total_files, total_is_approximate = await count_search_results(query, channel_id)
+    return files, total_files, total_is_approximate, has_more
 
 # =========================
 # Channel & User Utilities
@@ -149,45 +267,53 @@ def build_search_pipeline(query, allowed_ids, skip, limit):
 async def get_allowed_channels():
     return [
         doc["channel_id"]
-        for doc in allowed_channels_col.find({}, {"_id": 0, "channel_id": 1})
+        async for doc in allowed_channels_col.find({}, {"_id": 0, "channel_id": 1})
     ]
 
-def add_user(user_id):
+async def add_user(user_id):
     """
     Add a user to users_col only if not already present.
     Stores user_id, joined_date (UTC), and blocked status.
     Returns the user document with an extra key '_new' (True if newly added).
     """
-    user_doc = users_col.find_one({"user_id": user_id})
-    
-    if not user_doc:
-        user_doc = {
-            "user_id": user_id,
-            "joined": datetime.now(timezone.utc),
-            "blocked": False
-        }
-
-        users_col.insert_one(user_doc)
+    user_doc = await users_col.find_one({"user_id": user_id})
+    if user_doc:
+        user_doc["_new"] = False
+        return user_doc
 
-        user_doc["_new"] = True
-    else:
+    # Upsert so two quick first messages cannot race into a DuplicateKeyError
+    user_doc = {
+        "user_id": user_id,
+        "joined": datetime.now(timezone.utc),
+        "blocked": False
+    }
+    result = await users_col.update_one(
+        {"user_id": user_id},
+        {"$setOnInsert": user_doc},
+        upsert=True
+    )
+    if result.upserted_id is None:
+        user_doc = await users_col.find_one({"user_id": user_id})
         user_doc["_new"] = False
-    
+    else:
+        user_doc["_id"] = result.upserted_id
+        user_doc["_new"] = True
+
     return user_doc
 
 
-def authorize_user(user_id):
+async def authorize_user(user_id):
     """Authorize a user for 24 hours."""
     expiry = datetime.now(timezone.utc) + timedelta(seconds=TOKEN_VALIDITY_SECONDS)
-    auth_users_col.update_one(
+    await auth_users_col.update_one(
         {"user_id": user_id},
         {"$set": {"expiry": expiry}},
         upsert=True
     )
 
-def is_user_authorized(user_id):
+async def is_user_authorized(user_id):
     """Check if a user is authorized."""
-    doc = auth_users_col.find_one({"user_id": user_id})
+    doc = await auth_users_col.find_one({"user_id": user_id})
     if not doc:
         return False
     expiry = doc["expiry"]
@@ -220,11 +346,11 @@ async def get_user_link(user: User) -> str:
 # Token Utilities
 # =========================
 
-def generate_token(user_id):
+async def generate_token(user_id):
     """Generate a new access token for a user."""
     token_id = str(uuid.uuid4())
     expiry = datetime.now(timezone.utc) + timedelta(seconds=TOKEN_VALIDITY_SECONDS)
-    tokens_col.insert_one({
+    await tokens_col.insert_one({
         "token_id": token_id,
         "user_id": user_id,
         "expiry": expiry,
@@ -232,16 +358,16 @@ def generate_token(user_id):
     })
     return token_id
 
-def is_token_valid(token_id, user_id):
+async def is_token_valid(token_id, user_id):
     """Check if a token is valid for a user."""
-    token = tokens_col.find_one({"token_id": token_id, "user_id": user_id})
+    token = await tokens_col.find_one({"token_id": token_id, "user_id": user_id})
     if not token:
         return False
     expiry = token["expiry"]
     if expiry.tzinfo is None:
         expiry = expiry.replace(tzinfo=timezone.utc)
     if expiry < datetime.now(timezone.utc):
-        tokens_col.delete_one({"_id": token["_id"]})
+        await tokens_col.delete_one({"_id": token["_id"]})
         return False
     return True
 
@@ -297,75 +423,123 @@ async def shorten_url(url):
             "format": "text"
         }
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(api_url, params=params) as response:
-                if response.status == 200:
-                    return (await response.text()).strip()
-                else:
-                    logger.error(
-                        f"URL shortening failed. Status code: {response.status}, Response: {await response.text()}"
-                    )
-                    return url
+        status, text = await http.get_text(api_url, params=params)
+        if status == 200:
+            return text.strip()
+        else:
+            logger.error(
+                f"URL shortening failed. Status code: {status}, Response: {text}"
+            )
+            return url
     except Exception as e:
         logger.error(f"URL shortening failed: {e}")
         return url
+
+async def get_unlock_link(user_id):
+    """Shortened token deep link for an unauthorized user, reusing an unexpired token."""
+    now = datetime.now(timezone.utc)
+    token_doc = await tokens_col.find_one({"user_id": user_id, "expiry": {"$gt": now}})
+    token_id = token_doc["token_id"] if token_doc else await generate_token(user_id)
+    return await shorten_url(get_token_link(token_id, BOT_USERNAME))
     
 # =========================
 # File Utilities
 # =========================
-def upsert_file_info(file_info):
-    """Insert or update file info, avoiding duplicates."""
-    files_col.update_one(
-        {"channel_id": file_info["channel_id"], "message_id": file_info["message_id"]},
-        {"$set": file_info},
-        upsert=True
-    )
-
-def upsert_tmdb_info(tmdb_id, tmdb_type):
+async def delete_file_info(channel_id, message_id, end_message_id=None):
     """
-    Insert or update TMDB info in tmdb_col.
-    Only stores tmdb_id and tmdb_type.
+    Delete one file, or every file in a message_id range, and drop it from the search index.
+    Returns the number of deleted documents.
     """
-    tmdb_col.update_one(
-        {"tmdb_id": tmdb_id, "tmdb_type": tmdb_type},
-        {"$setOnInsert": {"tmdb_id": tmdb_id, "tmdb_type": tmdb_type}},
-        upsert=True
-    )
+    if end_message_id is None:
+        result = await files_col.delete_one({"channel_id": channel_id, "message_id": message_id})
+        search_index.remove(channel_id, message_id)
+    else:
+        result = await files_col.delete_many({
+            "channel_id": channel_id,
+            "message_id": {"$gte": message_id, "$lte": end_message_id}
+        })
+        search_index.remove_range(channel_id, message_id, end_message_id)
+    if result.deleted_count:
+        invalidate_search_cache(channel_id)
+    return result.deleted_count
+
+async def get_tmdb_post(tmdb_id, tmdb_type, doc=None, refresh=False):
+    """
+    Build a poster post for a title: {tmdb_id, tmdb_type, photo, caption, trailer_url, cached}.
+    Reuses the photo file_id, caption and trailer stored on the tmdb_col document
+    and only calls TMDB when nothing is stored (or `refresh` is set).
+    Returns None if the title has no poster.
+    """
+    if doc is None and not refresh:
+        doc = await tmdb_col.find_one({"tmdb_id": tmdb_id, "tmdb_type": tmdb_type})
+    if doc and doc.get("poster_file_id") and not refresh:
+        return {
+            "tmdb_id": tmdb_id,
+            "tmdb_type": tmdb_type,
+            "photo": doc["poster_file_id"],
+            "caption": doc.get("caption"),
+            "trailer_url": doc.get("trailer_url"),
+            "cached": True,
+        }
+    results = await get_info(tmdb_type, tmdb_id)
+    if not results.get("poster_url"):
+        return None
+    return {
+        "tmdb_id": tmdb_id,
+        "tmdb_type": tmdb_type,
+        "photo": results["poster_url"],
+        "caption": results.get("message"),
+        "trailer_url": results.get("trailer_url"),
+        "cached": False,
+    }
 
-async def restore_tmdb_photos(bot, start_id=None):
+async def send_tmdb_post(bot, post, chat_id=UPDATE_CHANNEL_ID):
     """
-    Restore all TMDB poster photos from the database.
-    For each tmdb entry, fetch details and send the poster to UPDATE_CHANNEL_ID.
+    Send a post built by get_tmdb_post. After the first upload from a URL the
+    photo file_id, caption and trailer are stored on the tmdb_col document; a
+    cached file_id Telegram no longer accepts falls back to a fresh upload.
+    Returns the sent message or None.
     """
-    query = {}
-    if start_id:
-        query['_id'] = {'$gt': start_id}
-    cursor = tmdb_col.find(query).sort('_id', 1)
-    docs = list(cursor)
-    for doc in docs:
-        tmdb_id = doc.get("tmdb_id")
-        tmdb_type = doc.get("tmdb_type")
+    trailer = post.get("trailer_url")
+    keyboard = InlineKeyboardMarkup(
+        [[InlineKeyboardButton("🎥 Trailer", url=trailer)]]) if trailer else None
+    send = bot.send_photo(
+        chat_id,
+        photo=post["photo"],
+        caption=post.get("caption"),
+        parse_mode=enums.ParseMode.HTML,
+        reply_markup=keyboard
+    )
+    if post["cached"]:
+        # Only a rejected file_id warrants a fresh upload; throttling or chat errors do not
         try:
-            results = await get_info(tmdb_type, tmdb_id)
-            poster_url = results.get('poster_url')
-            trailer = results.get('trailer_url')
-            info = results.get('message')
-            keyboard = InlineKeyboardMarkup(
-                [[InlineKeyboardButton("🎥 Trailer", url=trailer)]]) if trailer else None
-            if poster_url:
-                await safe_api_call(
-                    bot.send_photo(
-                        UPDATE_CHANNEL_ID,
-                        photo=poster_url,
-                        caption=info,
-                        parse_mode=enums.ParseMode.HTML,
-                        reply_markup=keyboard
-                    )
-                )
+            return await send
+        except REJECTED_FILE_ID_ERRORS as e:
+            logger.warning(f"Stored poster for {post['tmdb_type']} {post['tmdb_id']} rejected ({e.ID}), uploading again")
+        except FloodWait as e:
+            logger.error(f"API call dropped after repeated FloodWait ({e.value}s)")
+            return None
         except Exception as e:
-            logger.error(f"Error in restore_tmdb_photos for tmdb_id={tmdb_id}: {e}")
-            continue  # Continue to the next doc
-
+            logger.error(f"An error occurred during an API call: {e}")
+            return None
+        fresh = await get_tmdb_post(post["tmdb_id"], post["tmdb_type"], refresh=True)
+        return await send_tmdb_post(bot, fresh, chat_id) if fresh else None
+
+    sent = await safe_api_call(send)
+    if sent and sent.photo:
+        await tmdb_col.update_one(
+            {"tmdb_id": post["tmdb_id"], "tmdb_type": post["tmdb_type"]},
+            {
+                "$set": {
+                    "poster_file_id": sent.photo.file_id,
+                    "caption": post.get("caption"),
+                    "trailer_url": trailer,
+                },
+                "$setOnInsert": {"tmdb_id": post["tmdb_id"], "tmdb_type": post["tmdb_type"]}
+            },
+            upsert=True
+        )
+    return sent
 
 def extract_file_info(message, channel_id=None):
     """Extract file info from a Pyrogram message."""
@@ -428,17 +602,67 @@ def remove_unwanted(caption):
 # Async/Bot Utilities
 # =========================
 async def safe_api_call(coro):
-    """Utility wrapper to add delay before every bot API call."""
+    """
+    Utility wrapper for bot API calls.
+    Rate limiting and FloodWait retries happen in Bot.invoke; a FloodWait that
+    still reaches here has exhausted its retries and is logged.
+    """
     try:
         return await coro
     except (UserIsBlocked, InputUserDeactivated, PeerIdInvalid, UserIsBot) as e:
         raise e
     except FloodWait as e:
-        await asyncio.sleep(e.value * 1.2)
+        logger.error(f"API call dropped after repeated FloodWait ({e.value}s)")
+        return None
     except Exception as e:
         logger.error(f"An error occurred during an API call: {e}")
         return None
 
+# What to tell the user for each send_file_to_user result
+FILE_STATUS_TEXT = {
+    "sent": "File will delete in few minutes forward it to your saved messages!",
+    "limit": "You've requested a lot of files! Please wait a moment before trying again. 😊",
+    "missing": "I couldn't find that file. It might have been removed.",
+    "failed": "Failed to send file. Please try again later.",
+}
+
+async def send_file_to_user(bot, user_id, channel_id, message_id):
+    """
+    Copy an indexed file to an authorized user, with a signed stream link when
+    MY_DOMAIN is set, and schedule its deletion.
+    Returns "sent", "limit" (too many files this session), "missing" or "failed".
+    """
+    if bot.user_file_count.get(user_id, 0) >= bot.MAX_FILES_PER_SESSION:
+        return "limit"
+
+    file_doc = await files_col.find_one({"channel_id": channel_id, "message_id": message_id})
+    if not file_doc:
+        return "missing"
+
+    file_name = file_doc.get("file_name", "Unknown File")
+
+    # The user is authorized here, so hand out a signed, expiring stream link
+    stream_markup = None
+    if MY_DOMAIN:
+        stream_link = bot.sign_stream_link(channel_id, message_id, user_id)
+        stream_markup = InlineKeyboardMarkup(
+            [[InlineKeyboardButton("▶️ Stream / Download", url=f"{MY_DOMAIN}/stream/{stream_link}")]]
+        )
+
+    copy_msg = await safe_api_call(bot.copy_message(
+        chat_id=user_id,
+        from_chat_id=file_doc["channel_id"],
+        message_id=file_doc["message_id"],
+        caption=f"🎥 <b>{file_name}</b>",
+        reply_markup=stream_markup
+    ))
+    if not copy_msg:
+        return "failed"
+
+    bot.user_file_count[user_id] = bot.user_file_count.get(user_id, 0) + 1
+    bot.loop.create_task(delete_after_delay(bot, copy_msg.chat.id, copy_msg.id))
+    return "sent"
+
 async def delete_after_delay(client, channel_id, message_id, delay=AUTO_DELETE_SECONDS):
     await asyncio.sleep(delay)
     try:
@@ -476,137 +700,276 @@ async def extract_tmdb_link(tmdb_url):
 # Queue System for File Processing
 # =========================
 
-file_queue = asyncio.Queue()
+# Writer shards: every (channel_id, file_name) always maps to the same queue, so
+# items for one name stay ordered and duplicate detection stays correct.
+file_queues = [asyncio.Queue() for _ in range(max(FILE_WORKERS, 1))]
 
-async def handle_duplicate_file(bot, file_info):
-    """Checks for duplicate files and logs if found."""
-    existing = files_col.find_one({
-        "channel_id": file_info["channel_id"],
-        "file_name": file_info["file_name"]
-    })
-    if existing:
-        telegram_link = generate_c_link(file_info["channel_id"], file_info["message_id"])
-        await safe_api_call(
-            bot.send_message(
-                LOG_CHANNEL_ID,
-                f"⚠️ Duplicate File.\nLink: {telegram_link}",
-                parse_mode=enums.ParseMode.HTML
-            )
+# Network-heavy post-processing (audio thumbnails, TMDB) runs off the write path
+enrich_queue = asyncio.Queue()
+
+# TMDB titles currently being posted, so concurrent enrich workers never double-post
+tmdb_in_progress = set()
+
+# Running prefetch tasks; the loop only keeps weak references to tasks
+prefetch_tasks = set()
+
+def file_queue_for(file_info):
+    return file_queues[hash((file_info["channel_id"], file_info["file_name"])) % len(file_queues)]
+
+
+async def find_duplicate_files(items):
+    """
+    Resolve duplicates for a whole batch with a single $in query per channel.
+    An item is a duplicate when its (channel_id, file_name) already exists in the
+    database or was saved by an earlier item of the same batch.
+    Returns the set of positions in `items` that are duplicates.
+    """
+    names_by_channel = {}
+    for file_info, _, _, duplicate, _ in items:
+        if duplicate:
+            names_by_channel.setdefault(file_info["channel_id"], set()).add(file_info["file_name"])
+    if not names_by_channel:
+        return set()
+
+    query = {"$or": [
+        {"channel_id": channel_id, "file_name": {"$in": list(names)}}
+        for channel_id, names in names_by_channel.items()
+    ]}
+    existing = {
+        (doc["channel_id"], doc["file_name"])
+        async for doc in files_col.find(query, {"_id": 0, "channel_id": 1, "file_name": 1})
+    }
+
+    duplicates = set()
+    for pos, (file_info, _, _, duplicate, _) in enumerate(items):
+        key = (file_info["channel_id"], file_info["file_name"])
+        if duplicate and key in existing:
+            duplicates.add(pos)
+        else:
+            existing.add(key)
+    return duplicates
+
+async def report_duplicate_file(bot, file_info):
+    """Logs a duplicate file to the log channel."""
+    telegram_link = generate_c_link(file_info["channel_id"], file_info["message_id"])
+    await safe_api_call(
+        bot.send_message(
+            LOG_CHANNEL_ID,
+            f"⚠️ Duplicate File.\nLink: {telegram_link}",
+            parse_mode=enums.ParseMode.HTML
         )
-        return True
-    return False
+    )
 
 async def process_audio_file(bot, message):
     """Processes audio files: downloads, gets thumbnail, sends info, and cleans up."""
+    audio_path = thumb_path = None
     try:
-        audio_path = await bot.download_media(message)
+        # Per-message name: enrich workers download concurrently, and audio
+        # posts in different channels often share a file name
+        file_name = os.path.basename(message.audio.file_name or "audio")
+        audio_path = await bot.download_media(
+            message,
+            file_name=f"downloads/{message.chat.id}_{message.id}_{file_name}"
+        )
         thumb_path = await get_audio_thumbnail(audio_path)
         if thumb_path:
             file_info_text = f"🎧 <b>Title:</b> {message.audio.title}\n🧑‍🎤 <b>Artist:</b> {message.audio.performer}"
             await bot.send_photo(UPDATE_CHANNEL_ID2, photo=thumb_path, caption=file_info_text)
-            os.remove(thumb_path)
-        os.remove(audio_path)
     except Exception as e:
         logger.error(f"Error processing audio file: {e}")
-
+    finally:
+        for path in (thumb_path, audio_path):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+
+def parse_tmdb_title(file_name):
+    """Parse a file name into the (title, year, kind) tuple used for TMDB lookups."""
+    title = remove_redandent(file_name)
+    parsed_data = PTN.parse(title)
+    title = parsed_data.get("title", "").replace("_", " ").replace("-", " ").replace(":", " ")
+    title = ' '.join(title.split())
+    year = parsed_data.get("year")
+    kind = "tv" if parsed_data.get("season") or parsed_data.get("episode") else "movie"
+    return title, year, kind
+
+def is_tmdb_channel(channel_id):
+    return str(channel_id) in TMDB_CHANNEL_ID
+
+async def prefetch_tmdb_ids(items):
+    """Resolve the distinct titles of a saved batch concurrently ahead of the enrich workers."""
+    titles = [
+        parse_tmdb_title(file_info["file_name"])
+        for file_info, _, _, duplicate, _ in items
+        if duplicate and is_tmdb_channel(file_info["channel_id"])
+    ]
+    if titles:
+        await title_resolver.resolve_many(titles)
 
 async def process_tmdb_info(bot, file_info):
     """Processes TMDB info for a file."""
     try:
-        if str(file_info["channel_id"]) in TMDB_CHANNEL_ID:
-            title = remove_redandent(file_info["file_name"])
-            parsed_data = PTN.parse(title)
-            title = parsed_data.get("title", "").replace("_", " ").replace("-", " ").replace(":", " ")
-            title = ' '.join(title.split())
-            year = parsed_data.get("year")
-            season = parsed_data.get("season")
-            episode = parsed_data.get("episode")
-            if season or episode:
-                result = await get_tv_id(title, year)
-            else:
-                result = await get_movie_id(title, year)
+        if is_tmdb_channel(file_info["channel_id"]):
+            title, year, kind = parse_tmdb_title(file_info["file_name"])
+            result = await title_resolver.resolve(title, year, kind)
+            if result is None:
+                return
             tmdb_id, tmdb_type = result['id'], result['media_type']
-            exists = tmdb_col.find_one({"tmdb_id": tmdb_id, "tmdb_type": tmdb_type})
-            if not exists:
-                results = await get_info(tmdb_type, tmdb_id)
-                poster_url = results.get('poster_url')
-                trailer = results.get('trailer_url')
-                info = results.get('message')
-                keyboard = InlineKeyboardMarkup(
-                    [[InlineKeyboardButton("🎥 Trailer", url=trailer)]]) if trailer else None
-
-                if poster_url:
-                    await safe_api_call(
-                        bot.send_photo(
-                            UPDATE_CHANNEL_ID,
-                            photo=poster_url,
-                            caption=info,
-                            parse_mode=enums.ParseMode.HTML,
-                            reply_markup=keyboard
-                        )
-                    )
-                    upsert_tmdb_info(tmdb_id, tmdb_type)
+            if (tmdb_id, tmdb_type) in tmdb_in_progress:
+                return
+            tmdb_in_progress.add((tmdb_id, tmdb_type))
+            try:
+                exists = await tmdb_col.find_one({"tmdb_id": tmdb_id, "tmdb_type": tmdb_type})
+                if not exists:
+                    post = await get_tmdb_post(tmdb_id, tmdb_type, refresh=True)
+                    if post:
+                        await send_tmdb_post(bot, post)
+            finally:
+                tmdb_in_progress.discard((tmdb_id, tmdb_type))
     except Exception as e:
         logger.info(f"TMDB Info not found for {file_info['file_name']}: {e}")
 
 
-async def file_queue_worker(bot):
+async def drain_file_queue(file_queue, max_items=FILE_BATCH_SIZE, window=FILE_BATCH_WINDOW):
+    """
+    Wait for one queued item, then keep collecting until the batch is full
+    or the time window has elapsed.
+    """
+    items = [await file_queue.get()]
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + window
+    while len(items) < max_items:
+        if not file_queue.empty():
+            items.append(file_queue.get_nowait())
+            continue
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        try:
+            items.append(await asyncio.wait_for(file_queue.get(), remaining))
+        except asyncio.TimeoutError:
+            break
+    return items
+
+async def save_file_batch(bot, items):
+    """
+    Save a batch of queued files: one duplicate lookup and one unordered bulk_write.
+    Each item's future is resolved with "saved", "duplicate" or "failed".
+    Returns the saved items.
+    """
+    duplicates = await find_duplicate_files(items)
+    to_save = [item for pos, item in enumerate(items) if pos not in duplicates]
+
+    failed = set()
+    if to_save:
+        operations = [
+            UpdateOne(
+                {"channel_id": file_info["channel_id"], "message_id": file_info["message_id"]},
+                {"$set": file_info},
+                upsert=True
+            )
+            for file_info, _, _, _, _ in to_save
+        ]
+        try:
+            await files_col.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                failed.add(error["index"])
+                logger.error(f"❌ Error saving file {to_save[error['index']][0]['file_name']}: {error.get('errmsg')}")
+        except Exception as e:
+            failed = set(range(len(to_save)))
+            logger.error(f"❌ Error saving file batch: {e}")
+
+    saved = []
+    for pos, item in enumerate(to_save):
+        file_info, _, _, _, done = item
+        if pos in failed:
+            status = "failed"
+        else:
+            status = "saved"
+            search_index.add(file_info)
+            saved.append(item)
+        if done and not done.done():
+            done.set_result(status)
+
+    for channel_id in {file_info["channel_id"] for file_info, _, _, _, _ in saved}:
+        schedule_search_invalidation(channel_id)
+
+    for pos in duplicates:
+        file_info, _, _, _, done = items[pos]
+        await report_duplicate_file(bot, file_info)
+        if done and not done.done():
+            done.set_result("duplicate")
+
+    return saved
+
+async def file_queue_worker(bot, file_queue):
     while True:
-        item = await file_queue.get()
-        file_info, _, message, duplicate = item
+        items = await drain_file_queue(file_queue)
         try:
-            if duplicate and await handle_duplicate_file(bot, file_info):
-                continue
+            with STAGE_SECONDS.labels("save_batch").time():
+                saved = await save_file_batch(bot, items)
+            if saved:
+                task = bot.loop.create_task(prefetch_tmdb_ids(saved))
+                prefetch_tasks.add(task)
+                task.add_done_callback(prefetch_tasks.discard)
+            for file_info, _, message, duplicate, _ in saved:
+                if duplicate:
+                    enrich_queue.put_nowait((file_info, message))
 
-            upsert_file_info(file_info)
+        except Exception as e:
+            logger.error(f"❌ Error saving files: {e}")
+            for _, _, _, _, done in items:
+                if done and not done.done():
+                    done.set_result("failed")
+        finally:
+            for _ in items:
+                file_queue.task_done()
 
-            if duplicate:
-                if message.audio:
+async def enrich_queue_worker(bot):
+    """Runs audio thumbnail and TMDB processing for saved files."""
+    while True:
+        file_info, message = await enrich_queue.get()
+        try:
+            if message.audio:
+                with STAGE_SECONDS.labels("audio_thumbnail").time():
                     await process_audio_file(bot, message)
+            with STAGE_SECONDS.labels("tmdb").time():
                 await process_tmdb_info(bot, file_info)
-
         except Exception as e:
-            logger.error(f"❌ Error saving file: {e}")
+            logger.error(f"❌ Error processing {file_info['file_name']}: {e}")
         finally:
-            file_queue.task_done()
+            enrich_queue.task_done()
+
+def start_file_workers(bot):
+    """Start one writer per file queue shard and ENRICH_WORKERS post-processing workers."""
+    for shard, file_queue in enumerate(file_queues):
+        track_queue(f"file_{shard}", file_queue)
+        bot.loop.create_task(file_queue_worker(bot, file_queue))
+    track_queue("enrich", enrich_queue)
+    for _ in range(max(ENRICH_WORKERS, 1)):
+        bot.loop.create_task(enrich_queue_worker(bot))
 
 # =========================
 # Unified File Queueing
 # =========================
 
 async def queue_file_for_processing(message, channel_id=None, reply_func=None, duplicate=True):
+    """
+    Queue a file for saving.
+    Returns a future resolved with "saved", "duplicate" or "failed" once the
+    file's batch has been written, or None if nothing was queued.
+    """
     try:            
         file_info = extract_file_info(message, channel_id=channel_id)
         if file_info["file_name"]:
-            await file_queue.put((file_info, reply_func, message, duplicate))
+            done = asyncio.get_running_loop().create_future()
+            await file_queue_for(file_info).put((file_info, reply_func, message, duplicate, done))
+            return done
     except Exception as e:
         if reply_func:
             await safe_api_call(reply_func(f"❌ Error queuing file: {e}"))
-
-def delete_expired_auth_users():
-    """
-    Delete expired auth users from auth_users_col using 'expiry' field.
-    """
-    now = datetime.now(timezone.utc)
-    result = auth_users_col.delete_many({"expiry": {"$lt": now}})
-    logger.info(f"Deleted {result.deleted_count} expired auth users.")
-
-def delete_expired_tokens():
-    """
-    Delete expired tokens from tokens_col using 'expiry' field.
-    """
-    now = datetime.now(timezone.utc)
-    result = tokens_col.delete_many({"expiry": {"$lt": now}})
-    logger.info(f"Deleted {result.deleted_count} expired tokens.")
-
-async def periodic_expiry_cleanup(interval_seconds=3600 * 4):
-    """
-    Periodically delete expired auth users and tokens.
-    """
-    while True:
-        delete_expired_auth_users()
-        delete_expired_tokens()
-        await asyncio.sleep(interval_seconds)
+    return None
 
 
 def remove_redandent(filename):
@@ -644,7 +1007,9 @@ def remove_redandent(filename):
 
 async def get_audio_thumbnail(audio_path, output_dir="downloads"):
     audio = MutagenFile(audio_path)
-    thumbnail_path = os.path.join(output_dir, "audio_thumbnail.jpg")
+    # Per-file name: several enrich workers may extract thumbnails at once
+    base_name = os.path.splitext(os.path.basename(audio_path))[0]
+    thumbnail_path = os.path.join(output_dir, f"{base_name}_thumbnail.jpg")
 
     if isinstance(audio, MP3):
         if audio.tags and isinstance(audio.tags, ID3):